@@ -0,0 +1,136 @@
+import argparse
+import ast
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark of parser_def_1/2/3 on synthetic .DEF files (see gen_def.py).
+# For each scale and section a file is generated where only that section has
+# `scale` records, then every variant parses the section in a fresh process
+# that reports its wall time, records/sec and peak RSS. The wall time does
+# not include reading the file nor building the grammar (read_s, grammar_s).
+#
+#   python benchmarks/bench_def.py --scales 10000 100000 --json results.jsonl
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import gen_def  # noqa: E402
+
+VARIANTS = ('parser_def_1', 'parser_def_2', 'parser_def_3')
+SECTIONS = ('components', 'pins', 'nets', 'specialnets')
+
+# Results name and records list of each section
+RECORDS = {'components': ('COMPONENTS', 'subcomponents'),
+           'pins': ('PINS', 'pin'),
+           'nets': ('NETS', 'net'),
+           'specialnets': ('SPECIALNETS', 'specialnets'),
+          }
+
+
+# Peak RSS in MB of this process and of its finished children (pool workers)
+def peak_rss():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+# Parse one section of path with a variant and return the measures.
+# Runs in its own process, so that peak RSS only covers this parse.
+def run_one(variant, section, path, options):
+    from def_sections import index_sections
+    module = importlib.import_module(variant)
+    parser = module.DefParser()
+    for name, value in options.items():
+        setattr(parser, name, value)
+    parser.events[0].set()  # parse the section alone
+
+    start = time.perf_counter()
+    with open(path) as ifile:
+        def_string = ifile.read()
+    section_index = index_sections(def_string)
+    read_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser.get_grammar(section)
+    grammar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = parser.parse_sections([section], def_string, section_index)
+    wall = time.perf_counter() - start
+
+    name, records = RECORDS[section]
+    result = results.get(name) or {}
+    n_records = len(result.get(records, result.get('table', ())))
+    return {'variant': variant,
+            'section': section,
+            'records': n_records,
+            'read_s': round(read_time, 3),
+            'grammar_s': round(grammar_time, 3),
+            'wall_s': round(wall, 3),
+            'records_per_s': round(n_records / wall) if wall else 0,
+            'peak_rss_mb': round(peak_rss(), 1),
+           }
+
+
+# Return a synthetic file with `scale` records in section (and one in the others)
+def synthetic_file(workdir, section, scale, seed):
+    path = os.path.join(workdir, 'synthetic_%s_%d_%d.def' % (section, scale, seed))
+    if not os.path.exists(path):
+        counts = {s: (scale if s == section else 1) for s in SECTIONS}
+        gen_def.generate(path + '.tmp', seed=seed, **counts)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+#
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DEF parsers per section')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--sections', nargs='+', default=list(SECTIONS), choices=SECTIONS)
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='DefParser attribute, e.g. --set components_fast_path=False')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'def_bench'),
+                        help='where the synthetic files are kept between runs')
+    parser.add_argument('--json', help='append one JSON line per measure to this file')
+    parser.add_argument('--child', nargs=3, metavar=('VARIANT', 'SECTION', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    options = {}
+    for item in args.set:
+        name, value = item.split('=', 1)
+        options[name] = ast.literal_eval(value)
+
+    if args.child:
+        print(json.dumps(run_one(*args.child, options)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print('%-13s %-12s %10s %9s %12s %10s' % ('variant', 'section', 'records', 'wall s', 'records/s', 'peak MB'))
+    for scale in args.scales:
+        for section in args.sections:
+            path = synthetic_file(args.workdir, section, scale, args.seed)
+            for variant in args.variants:
+                cmd = [sys.executable, os.path.abspath(__file__), '--child', variant, section, path]
+                cmd += ['--set=' + item for item in args.set]
+                out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, cwd=ROOT,
+                                     universal_newlines=True).stdout
+                measure = json.loads(out.strip().splitlines()[-1])
+                measure.update(scale=scale, seed=args.seed, options=args.set)
+                print('%-13s %-12s %10d %9.3f %12d %10.1f' % (
+                    variant, section, measure['records'], measure['wall_s'],
+                    measure['records_per_s'], measure['peak_rss_mb']))
+                if args.json:
+                    with open(args.json, 'a') as ofile:
+                        ofile.write(json.dumps(measure) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup benchmark: the wall time of short jobs, each run in a fresh
+# interpreter as the jobs that invoke the parser once per file. The
+# interpreter and the imports alone are measured too, to see where the
+# time of a short job goes.
+#
+#   python benchmarks/bench_startup.py --repeat 20 --json startup.jsonl
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+EXAMPLE = os.path.join(ROOT, 'example_1.def')
+
+# The whole job through the run() entry point, as a one-file script runs it
+PARSE = '''
+import {variant}
+parser = {variant}.DefParser()
+{setup}
+parser.def_files = [{path!r}]
+parser.sections_grp = [{sections!r}]
+parser.events[0].set()  # the sections are parsed on their own
+parser.run()
+'''
+
+SIMPLE = ['design', 'dbuPerMicron', 'diearea']
+
+
+# (name, code) of each job
+def scenarios(path):
+    jobs = [('interpreter', 'pass'),
+            ('import pyparsing', 'import pyparsing'),
+            ('import multiprocessing', 'import multiprocessing'),
+           ]
+    for variant in ('parser_def_1', 'parser_def_2', 'parser_def_3'):
+        jobs.append(('import ' + variant, 'import ' + variant))
+    jobs += [('parser_def_3 design/units/diearea',
+              PARSE.format(variant='parser_def_3', setup='', path=path, sections=SIMPLE)),
+             ('parser_def_3 design/units/diearea, grammars',
+              PARSE.format(variant='parser_def_3', setup='parser.simple_fast_path = False',
+                           path=path, sections=SIMPLE)),
+             ('parser_def_3 components',
+              PARSE.format(variant='parser_def_3', setup='', path=path, sections=['components'])),
+             ('parser_def_1 design/units/diearea',
+              PARSE.format(variant='parser_def_1', setup='', path=path, sections=SIMPLE)),
+            ]
+    return jobs
+
+
+# Wall time in seconds of each of repeat runs of code in a fresh interpreter
+def measure(code, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-W', 'ignore', '-c', code], check=True, cwd=ROOT,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+#
+def main():
+    parser = argparse.ArgumentParser(description='Measure the startup time of short parser jobs')
+    parser.add_argument('--file', default=EXAMPLE, help='.DEF file parsed by the jobs')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', help='append one JSON line per job to this file')
+    args = parser.parse_args()
+
+    print('%-44s %10s %10s' % ('job', 'median ms', 'min ms'))
+    for name, code in scenarios(os.path.abspath(args.file)):
+        times = measure(code, args.repeat)
+        median, best = statistics.median(times) * 1000, min(times) * 1000
+        print('%-44s %10.1f %10.1f' % (name, median, best))
+        if args.json:
+            with open(args.json, 'a') as ofile:
+                ofile.write(json.dumps({'job': name, 'file': args.file, 'repeat': args.repeat,
+                                        'median_ms': round(median, 1), 'min_ms': round(best, 1)}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
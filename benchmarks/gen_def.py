@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+
+# Synthetic .DEF generator for the benchmarks. The records follow the
+# structures of example_1.def, and the number of records of each section is
+# set independently. The output only depends on the counts and on the seed.
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example_1.def')
+ORIENTS = ('N', 'S', 'E', 'W', 'FN', 'FS', 'FE', 'FW')
+LAYERS = ('M1', 'M2', 'M3', 'M4', 'M5')
+VIAS = ('NR_VIA1_VH', 'NR_VIA1_HH', 'M2V2M3_HV', 'VIA2_RULE_1')
+BATCH = 10000  # records written at a time
+
+
+# Everything of example_1.def before COMPONENTS (VERSION ... VIAS)
+def header():
+    with open(EXAMPLE) as ifile:
+        text = ifile.read()
+    return text[:text.index('COMPONENTS ')]
+
+
+#
+def component(rng, i):
+    name = 'u%d/inst_%d' % (i % 97, i)
+    cell = 'BFX%d_P0' % (i % 30)
+    r = rng.random()
+    if r < 0.6:
+        return '- %s %s + PLACED ( %d %d ) %s\n ;\n' % (
+            name, cell, rng.randint(0, 200000), rng.randint(0, 200000), rng.choice(ORIENTS))
+    if r < 0.9:
+        return '- %s %s + FIXED ( %d %d ) %s + WEIGHT %d\n ;\n' % (
+            name, cell, rng.randint(0, 200000), rng.randint(0, 200000), rng.choice(ORIENTS), i % 5)
+    if r < 0.95:
+        return '- %s %s + SOURCE NETLIST + PLACED ( %d %d ) N + HALO 1 2 3 4 ;\n' % (
+            name, cell, rng.randint(0, 200000), rng.randint(0, 200000))
+    return '- %s RAM%d + PLACED ( %d %d ) FS + ROUTEHALO %d M1 M3 ;\n' % (
+        name, i % 3, rng.randint(0, 200000), rng.randint(0, 200000), i % 100)
+
+
+#
+def pin(rng, i):
+    x = rng.randint(0, 140000)
+    r = rng.random()
+    if r < 0.8:
+        return ('- p%d + NET p%d + DIRECTION %s + USE SIGNAL\n'
+                '  + LAYER M2 ( -25 0 ) ( 25 220 )\n'
+                '  + PLACED ( 0 %d ) E \n;\n') % (i, i, rng.choice(('INPUT', 'OUTPUT')), x)
+    if r < 0.9:
+        return ('- p%d + NET gnd + SPECIAL + DIRECTION INOUT + USE GROUND\n'
+                ' + PORT\n'
+                '  + LAYER M3 ( -1000 0 ) ( 1000 2000 )\n'
+                '  + FIXED ( %d 0 ) N\n ;\n') % (i, x)
+    return ('- p%d + NET vdd + SPECIAL + DIRECTION INOUT + USE POWER\n'
+            ' + PORT\n'
+            '  + LAYER M3 ( -1000 0 ) ( 1000 2000 )\n'
+            '  + FIXED ( %d 0 ) N\n'
+            ' + PORT\n'
+            '  + LAYER M3 ( -1000 0 ) ( 1000 2000 )\n'
+            '  + FIXED ( %d 140000 ) S\n ;\n') % (i, x, x)
+
+
+# ROUTED wiring: a first segment and n_new NEW segments, some with '*' points and vias
+def routing(rng, keyword, n_new, width=''):
+    lines = []
+    for k in range(n_new + 1):
+        x, y = rng.randint(0, 140000), rng.randint(0, 140000)
+        points = '( %d %d ) ( %d * )' % (x, y, rng.randint(0, 140000))
+        if rng.random() < 0.3:
+            points += ' ( * %d )' % rng.randint(0, 140000)
+        via = ' ' + rng.choice(VIAS) if rng.random() < 0.4 else ''
+        lines.append('%s%s %s%s%s\n' % ('  + ' + keyword + ' ' if k == 0 else '    NEW ',
+                                        rng.choice(LAYERS), width, points, via))
+    return ''.join(lines)
+
+
+#
+def net(rng, i):
+    lines = ['- n%d\n' % i]
+    n_conn = rng.randint(2, 5)
+    conns = ['( PIN n%d )' % i] + ['( u%d/inst_%d Z )' % (rng.randrange(97), rng.randrange(1 << 20))
+                                   for _ in range(n_conn - 1)]
+    lines.append('  ' + ' '.join(conns) + '\n')
+    if i % 10 == 0:
+        lines.append('  + VPIN n%d.v LAYER M2 ( -10 -10 ) ( 10 10 ) FIXED ( %d %d )\n'
+                     % (i, rng.randint(0, 140000), rng.randint(0, 140000)))
+        lines.append('  + SUBNET n%d.s ( VPIN n%d.v ) ( u%d/inst_%d I )\n'
+                     '    NONDEFAULTRULE rule1\n' % (i, i, rng.randrange(97), i))
+        lines.append(routing(rng, 'ROUTED', rng.randint(0, 2)).replace('  + ROUTED', '    ROUTED'))
+    lines.append(routing(rng, 'ROUTED', rng.randint(0, 6)))
+    lines.append(' ;\n')
+    return ''.join(lines)
+
+
+#
+def specialnet(rng, i):
+    conns = ' '.join('( WELLTAP_%d vdd )' % rng.randrange(1 << 20) for _ in range(4))
+    lines = ['- sn%d  %s\n' % (i, conns)]
+    for k in range(rng.randint(1, 8)):
+        x, y = rng.randint(0, 140000), rng.randint(0, 140000)
+        shape = rng.choice(('FOLLOWPIN', 'STRIPE'))
+        lines.append('%s%s %d + SHAPE %s ( %d %d ) ( %s )\n' % (
+            '  + ROUTED ' if k == 0 else '    NEW ', rng.choice(LAYERS), rng.choice((0, 208, 2000)),
+            shape, x, y, rng.choice(('%d *' % rng.randint(0, 140000), '* %d' % rng.randint(0, 140000)))))
+    lines.append('  + USE POWER\n ;\n')
+    return ''.join(lines)
+
+
+# Write a block section of n records made by make_record(rng, i)
+def write_section(ofile, keyword, n, make_record, rng):
+    ofile.write('%s %d ;\n' % (keyword, n))
+    for start in range(0, n, BATCH):
+        ofile.write(''.join(make_record(rng, i) for i in range(start, min(n, start + BATCH))))
+    ofile.write('END %s\n\n' % keyword)
+
+
+# Write a synthetic .DEF file at path. Each section has its own random
+# stream, so the records of a section do not change with the other counts.
+def generate(path, components=10000, pins=10000, nets=10000, specialnets=10000, seed=1):
+    with open(path, 'w') as ofile:
+        ofile.write(header())
+        for k, (keyword, n, make_record) in enumerate((('COMPONENTS', components, component),
+                                                      ('PINS', pins, pin),
+                                                      ('SPECIALNETS', specialnets, specialnet),
+                                                      ('NETS', nets, net))):
+            write_section(ofile, keyword, n, make_record, random.Random(seed * 16 + k))
+        ofile.write('END DESIGN\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic .DEF file')
+    parser.add_argument('path')
+    parser.add_argument('--components', type=int, default=10000)
+    parser.add_argument('--pins', type=int, default=10000)
+    parser.add_argument('--nets', type=int, default=10000)
+    parser.add_argument('--specialnets', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.path, args.components, args.pins, args.nets, args.specialnets, args.seed)
@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import json
+import os
+import threading
+
+from def_compress import map_def
+from def_design import RESULT_NAMES
+from def_sections import index_sections, split_records, text_slice, SECTION_KEYWORDS
+from parser_def_1 import DefParser
+
+# asyncio entry points. The parsing runs in an executor: the default thread
+# pool of the loop, or any concurrent.futures executor given as executor
+# (a ProcessPoolExecutor to use several cores). The event loop only waits.
+#
+#   results = await parse_def_async('example_1.def', sections=['diearea', 'components'])
+#   async for comp in iter_records_async('example_1.def', 'components', executor=pool):
+#       ...
+
+CHUNK_SIZE = 1 << 20  # characters of records per task of iter_records_async
+WINDOW = 8  # chunks of iter_records_async in the executor at a time
+MAX_FILES = 4  # files kept mapped by each executor process
+
+# Parsers and mapped files of the executor processes (or of this process for threads)
+_lock = threading.Lock()
+_parsers = {}
+_files = {}
+
+
+# Options of parser sent with the tasks: the executor parses with its own
+# DefParser, built once per set of options
+def parser_options(parser):
+    options = parser.cache_config()
+    del options['grammar_version']
+    options['components_fast_path'] = parser.components_fast_path
+    return options
+
+
+#
+def _get_parser(options):
+    key = json.dumps(options, sort_keys=True)
+    with _lock:
+        if key not in _parsers:
+            parser = DefParser()
+            for name, value in options.items():
+                setattr(parser, name, value)
+            parser.events[0].set()  # the sections are parsed on their own
+            _parsers[key] = parser
+        return _parsers[key]
+
+
+# Return the mapped .DEF file at path (decompressed, def_compress) and its
+# section index, kept while the file is unchanged
+def _open(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key not in _files:
+            if len(_files) >= MAX_FILES:
+                _files.clear()  # the tasks still using a file keep their own reference
+            def_string = map_def(path)
+            _files[key] = (def_string, index_sections(def_string))
+        return _files[key]
+
+
+# Executor task: the result of one section of the .DEF file at path
+def _parse_section(path, section, options):
+    parser = _get_parser(options)
+    def_string, section_index = _open(path)
+    results = parser.parse_sections([section], def_string, section_index)
+    parser.pop_stats()  # not kept by a long-running executor
+    return results.get(RESULT_NAMES[section])
+
+
+# Executor task: the spans of the chunks of records of a block section
+def _record_chunks(path, section, chunk_size):
+    def_string, section_index = _open(path)
+    keyword = SECTION_KEYWORDS[section]
+    if keyword not in section_index:
+        return []
+    start, end = section_index[keyword]
+    return split_records(def_string, max(1, (end - start) // chunk_size), start, end)[1]
+
+
+# Executor task: the records of a chunk of a block section
+def _parse_chunk(path, section, span, options):
+    parser = _get_parser(options)
+    def_string, _ = _open(path)
+    start, end = span
+    chunk = text_slice(def_string, start, end)
+    return parser.parse_records_chunk(section, chunk, start, not isinstance(def_string, str))
+
+
+# Parse the sections of the .DEF file at path in executor and yield
+# (section, result) as each one is done, not in the order of sections.
+# sections defaults to those of parser.sections_grp. When the iteration
+# is cancelled or left early, the sections not started yet are cancelled
+# (a section already running finishes in the executor, its result is dropped).
+async def iter_sections_async(path, sections=None, parser=None, executor=None):
+    loop = asyncio.get_running_loop()
+    parser = DefParser() if parser is None else parser
+    if sections is None:
+        sections = [section for group in parser.sections_grp for section in group]
+    options = parser_options(parser)
+    futures = {loop.run_in_executor(executor, _parse_section, path, section, options): section
+               for section in sections}
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# Parse the sections of the .DEF file at path in executor and return the
+# results as DefParser.parse_file does ({'DESIGN': ..., 'COMPONENTS': ...})
+async def parse_def_async(path, sections=None, parser=None, executor=None):
+    results = {}
+    async for section, result in iter_sections_async(path, sections, parser, executor):
+        if result is not None:
+            results[RESULT_NAMES[section]] = result
+    return results
+
+
+# Yield the records of a block section of the .DEF file at path, in file
+# order. The section is split in chunks of about chunk_size characters and
+# up to window chunks are parsed in executor ahead of the consumer.
+async def iter_records_async(path, section, parser=None, executor=None,
+                             chunk_size=CHUNK_SIZE, window=WINDOW):
+    loop = asyncio.get_running_loop()
+    options = parser_options(DefParser() if parser is None else parser)
+    spans = await loop.run_in_executor(None, _record_chunks, path, section, chunk_size)
+    pending = collections.deque()
+    try:
+        for span in spans:
+            pending.append(loop.run_in_executor(executor, _parse_chunk, path, section, span, options))
+            if len(pending) >= window:
+                for record in await pending.popleft():
+                    yield record
+        while pending:
+            for record in await pending.popleft():
+                yield record
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+
+# Bump when the layout of the cache files changes
+CACHE_VERSION = 1
+MAGIC = b'DEFPCACH'
+_header = struct.Struct('<8sII')  # magic, version, number of sections
+_entry = struct.Struct('<HQ')      # section name length, payload length
+
+
+# On-disk cache of parse results, one file per (file content, parser configuration).
+# Each file holds the results section by section, so a reader can skip the
+# sections it does not need. The least recently used files are removed when
+# the cache grows over max_bytes.
+class ParseCache:
+    #
+    def __init__(self, directory, max_bytes=10 * 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, 'stat'), exist_ok=True)
+
+    # Hash of the content of the file at path. Hashing a multi-GB file takes
+    # seconds, so the hash is remembered for the (size, mtime) of the file.
+    def file_hash(self, path):
+        st = os.stat(path)
+        stamp = '%d %d' % (st.st_size, st.st_mtime_ns)
+        stat_file = os.path.join(self.directory, 'stat',
+                                 hashlib.blake2b(os.path.abspath(path).encode(), digest_size=16).hexdigest())
+        try:
+            with open(stat_file, 'r') as ifile:
+                cached_stamp, digest = ifile.read().rsplit(' ', 1)
+            if cached_stamp == stamp:
+                return digest
+        except (OSError, ValueError):
+            pass
+
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as ifile:
+            for block in iter(lambda: ifile.read(1 << 24), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        self._write(stat_file, (stamp + ' ' + digest).encode())
+        return digest
+
+    # Cache key of the file at path parsed with the given configuration
+    def key(self, path, config):
+        h = hashlib.blake2b(digest_size=20)
+        h.update(self.file_hash(path).encode())
+        h.update(repr(sorted(config.items())).encode())
+        return h.hexdigest()
+
+    #
+    def path(self, key):
+        return os.path.join(self.directory, key + '.defc')
+
+    # Return {section: result} stored under key, None on a miss
+    def load(self, key, sections=None):
+        path = self.path(key)
+        try:
+            ifile = open(path, 'rb')
+        except OSError:
+            return None
+
+        with ifile:
+            try:
+                results = self._read(ifile, sections)
+            except (struct.error, EOFError, pickle.UnpicklingError, UnicodeDecodeError,
+                    AttributeError, ImportError):
+                # truncated or corrupt, or pickled before a class moved: dropped,
+                # the file is parsed again
+                results = None
+                os.remove(path)
+        if results is None:
+            return None
+
+        os.utime(path)  # mark as recently used
+        return results
+
+    # Read the sections of a cache file, None when it is from another CACHE_VERSION.
+    # Raises struct.error, EOFError, ... when the file is damaged, AttributeError or
+    # ImportError when a pickled class is no longer where it was
+    def _read(self, ifile, sections):
+        magic, version, n_sections = _header.unpack(ifile.read(_header.size))
+        if magic != MAGIC or version != CACHE_VERSION:
+            return None
+        size = os.fstat(ifile.fileno()).st_size
+        results = {}
+        for _ in range(n_sections):
+            name_len, payload_len = _entry.unpack(ifile.read(_entry.size))
+            name = ifile.read(name_len).decode()
+            if ifile.tell() + payload_len > size:
+                raise EOFError('cache file ends in section %r' % name)
+            if sections is None or name in sections:
+                results[name] = pickle.loads(ifile.read(payload_len))
+            else:
+                ifile.seek(payload_len, os.SEEK_CUR)
+        return results
+
+    # Store {section: result} under key
+    def store(self, key, results):
+        chunks = [_header.pack(MAGIC, CACHE_VERSION, len(results))]
+        for name, result in results.items():
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            chunks.append(_entry.pack(len(name.encode()), len(payload)))
+            chunks.append(name.encode())
+            chunks.append(payload)
+        self._write(self.path(key), b''.join(chunks))
+        self.evict()
+
+    # Remove the least recently used files until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.defc'):
+                st = os.stat(os.path.join(self.directory, name))
+                entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    # Write atomically, so a concurrent reader never sees a partial file
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as ofile:
+            ofile.write(data)
+        os.replace(tmp, path)
@@ -0,0 +1,157 @@
+import importlib
+import io
+import mmap
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+# Compressed .DEF inputs (.def.gz, .def.bz2, .def.xz), detected by their
+# magic bytes whatever their name. The decompression runs in a thread that
+# keeps up to DEPTH chunks ahead of the reader, so the decompression and
+# the parsing (or the copy to a temporary file) run as a pipeline: zlib,
+# bz2 and lzma release the GIL while they decompress.
+#
+#   with open_def('design.def.gz', newline='') as ifile:
+#       for line in ifile: ...
+#   def_string = map_def('design.def.xz')  # mmap of the decompressed text
+
+MAGIC = ((b'\x1f\x8b', 'gzip'),
+         (b'BZh', 'bz2'),
+         (b'\xfd7zXZ\x00', 'lzma'),
+        )
+CHUNK_SIZE = 1 << 20  # decompressed bytes per chunk
+DEPTH = 8  # chunks decompressed ahead of the reader
+
+
+# Name of the module decompressing the file at path ('gzip', 'bz2', 'lzma'),
+# None when it is not compressed
+def compression(path):
+    with open(path, 'rb') as ifile:
+        head = ifile.read(6)
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+# Raw binary stream of the decompressed file at path. A thread decompresses
+# it in chunks and puts them in a bounded queue; an error of the thread is
+# raised by the read that reaches it.
+class DecompressReader(io.RawIOBase):
+    #
+    def __init__(self, path, name, chunk_size=CHUNK_SIZE, depth=DEPTH):
+        self.chunks = queue.Queue(depth)
+        self.pending = memoryview(b'')
+        self.eof = False
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.decompress, args=(path, name, chunk_size),
+                                       name='decompress', daemon=True)
+        self.thread.start()
+
+    # Run by the thread: b'' marks the end of the file
+    def decompress(self, path, name, chunk_size):
+        try:
+            with importlib.import_module(name).open(path, 'rb') as ifile:
+                while True:
+                    data = ifile.read(chunk_size)
+                    if not self.put(data) or not data:
+                        return
+        except Exception as exc:
+            self.put(exc)
+
+    # Queue item, return False when the reader was closed meanwhile
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    # Return the next chunk of the thread, b'' at the end
+    def next_chunk(self):
+        if self.eof:
+            return b''
+        item = self.chunks.get()
+        if isinstance(item, BaseException):
+            self.eof = True
+            raise item
+        self.eof = not item
+        return item
+
+    #
+    def readable(self):
+        return True
+
+    #
+    def readinto(self, buffer):
+        if not self.pending:
+            self.pending = memoryview(self.next_chunk())
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    # The rest of the file, joined once instead of read in small pieces
+    def readall(self):
+        parts = [bytes(self.pending)]
+        self.pending = memoryview(b'')
+        while True:
+            data = self.next_chunk()
+            if not data:
+                return b''.join(parts)
+            parts.append(data)
+
+    #
+    def close(self):
+        self.stop.set()  # the thread stops at its next chunk
+        super().close()
+
+
+# Open the .DEF file at path, compressed or not, as open() does: a text file
+# by default, a binary one with mode 'rb'
+def open_def(path, mode='r', newline=None):
+    name = compression(path)
+    if name is None:
+        if 'b' in mode:
+            return open(path, mode)
+        return open(path, mode, newline=newline)
+    stream = io.BufferedReader(DecompressReader(path, name), CHUNK_SIZE)
+    if 'b' in mode:
+        return stream
+    return io.TextIOWrapper(stream, newline=newline)
+
+
+# Decompress the file at path to the binary file ofile
+def decompress_to(path, ofile):
+    with open_def(path, 'rb') as ifile:
+        shutil.copyfileobj(ifile, ofile, CHUNK_SIZE)
+
+
+# Return a read-only mmap of the .DEF file at path. A compressed file is
+# decompressed to an anonymous temporary file in directory (tempfile's
+# default when None), which is gone when the map is closed.
+def map_def(path, directory=None):
+    if compression(path) is None:
+        with open(path, 'rb') as ifile:
+            return mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+    with tempfile.TemporaryFile(dir=directory) as ofile:
+        decompress_to(path, ofile)
+        ofile.flush()
+        return mmap.mmap(ofile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Return the path of a decompressed copy of the compressed .DEF file at
+# path, for processes that map the file by its path. The caller removes it.
+def decompressed_copy(path, directory=None):
+    fd, copy_path = tempfile.mkstemp(suffix='.def', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as ofile:
+            decompress_to(path, ofile)
+    except BaseException:
+        os.unlink(copy_path)
+        raise
+    return copy_path
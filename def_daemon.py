@@ -0,0 +1,219 @@
+import argparse
+import collections
+import json
+import os
+import pickle
+import queue
+import socket
+import socketserver
+import struct
+import threading
+
+from def_compress import map_def
+from def_design import RESULT_NAMES
+from def_sections import index_sections, section_span, text_slice, SECTION_KEYWORDS
+from parser_def_1 import DefParser, RECORDS, _parse_file_chunk, _parse_file_sections
+
+# Long-running parser: the grammars are built and the pool of workers is
+# forked once, then the parse requests come over a Unix domain socket.
+#
+#   python3 def_daemon.py /tmp/def_parser.sock --workers 4
+#
+# A request is one JSON line {"path": ..., "sections": [...], "format": ...};
+# the daemon answers one message per section as soon as it is parsed, then
+# {"done": true} (or {"error": "..."}). With the 'json' format the messages
+# are JSON lines, with 'pickle' they are pickles prefixed by their 8-byte
+# length. Several requests can be sent on the same connection.
+
+FORMATS = ('json', 'pickle')
+CACHE_SIZE = 32  # designs kept in the LRU
+
+
+#
+class DefDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    #
+    def __init__(self, socket_path, parser=None, n_workers=None, cache_size=CACHE_SIZE):
+        self.parser = DefParser() if parser is None else parser
+        self.parser.events[0].set()  # the sections are parsed on their own, in any order
+        # Every grammar is built before the workers are forked
+        names = list(RESULT_NAMES) + ['subcomponent', 'components_header']
+        for section in RECORDS:
+            if self.parser.is_parallel(section):
+                names += [RECORDS[section][0], section + '_header']
+        for name in names:
+            self.parser.get_grammar(name)
+        self.pool = self.parser.make_pool(n_workers or self.parser.n_workers)
+        # (path, mtime, size) -> {'index': section index, section: result}
+        self.cache = collections.OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # left by a daemon that was killed
+        super().__init__(socket_path, DaemonHandler)
+        os.chmod(socket_path, 0o600)  # pickles are only exchanged with this user
+
+    # Return the LRU entry of the .DEF file at path, a new one when it changed
+    def entry(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            entry = self.cache[key] = {}
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return entry
+
+    # Yield (section, result) of the sections of the .DEF file at path, the
+    # cached ones first, then the others as each one is parsed by the pool
+    def parse(self, path, sections=None):
+        path = os.path.abspath(path)
+        sections = list(RESULT_NAMES) if sections is None else sections
+        for section in sections:
+            if section not in RESULT_NAMES:
+                raise ValueError('unknown section %r' % section)
+
+        entry = self.entry(path)
+        missing = []
+        for section in sections:
+            if section in entry:
+                yield section, entry[section]
+            else:
+                missing.append(section)
+        if not missing:
+            return
+
+        if 'index' not in entry:
+            def_string = map_def(path)
+            entry['index'] = index_sections(def_string)
+            def_string.close()
+
+        # The workers of the pool are daemonic and can not have a pool of
+        # their own: the parallel sections are split in chunk tasks here, as
+        # parse_batch does, and merged when their last chunk is done
+        done = queue.Queue()
+        chunks = {}  # section -> (header, plan, [chunk results])
+        n_tasks = 0
+        for section in missing:
+            if self.parser.is_parallel(section) and SECTION_KEYWORDS[section] in entry['index']:
+                header, plan = self.plan(path, entry['index'], section)
+                chunks[section] = (header, plan, [None] * len(plan))
+                for i, (kind, spans) in enumerate(plan):
+                    self.submit(done, (section, i), _parse_file_chunk, (path, section, kind, spans))
+                n_tasks += len(plan)
+            else:
+                self.submit(done, (section, None), _parse_file_sections, (path, entry['index'], [section]))
+                n_tasks += 1
+
+        pending = {section: len(chunks[section][1]) for section in chunks}
+        for _ in range(n_tasks):
+            (section, i), result = done.get()
+            if isinstance(result, BaseException):
+                raise result
+            if i is None:
+                entry[section] = result.get(RESULT_NAMES[section])
+            else:
+                chunks[section][2][i] = result
+                pending[section] -= 1
+                if pending[section]:
+                    continue
+                header, plan, results = chunks[section]
+                entry[section] = self.parser.merge_records(section, header, plan, results).get(
+                    RESULT_NAMES[section])
+            yield section, entry[section]
+
+    # Return (header, plan) of the chunk tasks of a parallel section, see DefParser.plan_chunks
+    def plan(self, path, section_index, section):
+        def_string = map_def(path)
+        start, end = section_span(def_string, section_index, section)
+        body_start, plan = self.parser.plan_chunks(section, def_string, start, end)
+        header = text_slice(def_string, start, body_start)
+        def_string.close()
+        return header, plan
+
+    # Run func(*args) on the pool, its result (or exception) is put in done with task
+    def submit(self, done, task, func, args):
+        self.pool.apply_async(func, args,
+                              callback=lambda output: done.put((task, self.parser.attach(output[0]))),
+                              error_callback=lambda exc: done.put((task, exc)))
+
+    #
+    def server_close(self):
+        super().server_close()
+        self.pool.terminate()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+# One connection: the requests are read one line at a time
+class DaemonHandler(socketserver.StreamRequestHandler):
+    #
+    def handle(self):
+        for line in self.rfile:
+            fmt = 'json'
+            try:
+                request = json.loads(line)
+                fmt = request.get('format', 'json')
+                if fmt not in FORMATS:
+                    fmt = 'json'
+                    raise ValueError('unknown format %r' % request['format'])
+                for section, result in self.server.parse(request['path'], request.get('sections')):
+                    self.send(fmt, {'section': section, 'result': result})
+                self.send(fmt, {'done': True})
+            except Exception as exc:
+                self.send(fmt, {'error': '%s: %s' % (type(exc).__name__, exc)})
+
+    #
+    def send(self, fmt, message):
+        if fmt == 'pickle':
+            data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+            self.wfile.write(struct.pack('>Q', len(data)) + data)
+        else:
+            self.wfile.write(json.dumps(message).encode() + b'\n')
+
+
+# Read one message of the daemon from rfile
+def read_message(rfile, fmt):
+    if fmt == 'pickle':
+        size, = struct.unpack('>Q', rfile.read(8))
+        return pickle.loads(rfile.read(size))
+    return json.loads(rfile.readline())
+
+
+# Send a request to the daemon listening at socket_path and yield
+# (section, result) as the daemon streams them
+def request(socket_path, path, sections=None, fmt='pickle'):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        message = {'path': os.path.abspath(path), 'sections': sections, 'format': fmt}
+        sock.sendall(json.dumps(message).encode() + b'\n')
+        with sock.makefile('rb') as rfile:
+            while True:
+                message = read_message(rfile, fmt)
+                if 'error' in message:
+                    raise RuntimeError(message['error'])
+                if message.get('done'):
+                    return
+                yield message['section'], message['result']
+
+
+#
+def main():
+    parser = argparse.ArgumentParser(description='Serve DEF parse requests on a Unix domain socket')
+    parser.add_argument('socket_path')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    with DefDaemon(args.socket_path, n_workers=args.workers, cache_size=args.cache_size) as daemon:
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+from def_compress import map_def
+from def_sections import index_sections
+from parser_def_1 import DefParser
+
+# Results name of each DefParser.parse_<section>
+RESULT_NAMES = {'design': 'DESIGN',
+                'dbuPerMicron': 'dbuPerMicron',
+                'diearea': 'DIEAREA',
+                'components': 'COMPONENTS',
+                'pins': 'PINS',
+                'nets': 'NETS',
+                'specialnets': 'SPECIALNETS',
+               }
+
+
+# Lazy view of a .DEF file. Only the section offset index is built up front;
+# each section is parsed the first time it is read and then memoized, so
+# the parse cost is only paid for the sections actually used.
+class DefDesign:
+    #
+    def __init__(self, path, parser=None):
+        self.path = path
+        self.parser = DefParser() if parser is None else parser
+        # Sections are parsed on demand and in any order
+        self.parser.events[0].set()
+        self.def_string = map_def(path)
+        self.section_index = index_sections(self.def_string)
+        self.results = {}
+
+    # Return the parse results of a section (a DefParser.parse_<section> name),
+    # None when the file does not have it
+    def section(self, section):
+        if section not in self.results:
+            results = self.parser.parse_sections([section], self.def_string, self.section_index)
+            self.results[section] = results.get(RESULT_NAMES[section])
+        return self.results[section]
+
+    #
+    @property
+    def design(self):
+        return self.section('design')
+
+    #
+    @property
+    def dbuPerMicron(self):
+        return self.section('dbuPerMicron')
+
+    #
+    @property
+    def diearea(self):
+        return self.section('diearea')
+
+    #
+    @property
+    def components(self):
+        return self.section('components')
+
+    #
+    @property
+    def pins(self):
+        return self.section('pins')
+
+    #
+    @property
+    def nets(self):
+        return self.section('nets')
+
+    #
+    @property
+    def specialnets(self):
+        return self.section('specialnets')
+
+    #
+    def close(self):
+        self.def_string.close()
+
+    #
+    def __enter__(self):
+        return self
+
+    #
+    def __exit__(self, *args):
+        self.close()
+
+
+# Open the .DEF file at path as a DefDesign
+def load(path, parser=None):
+    return DefDesign(path, parser)
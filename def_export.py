@@ -0,0 +1,297 @@
+import mmap
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from def_table import ComponentTable, NetTable, ORIENTS, ORIENT_NONE, STATUSES, wire_points
+
+# Columnar export of the parse results (DefParser.parse_file) for analytics.
+# Each section gives one or more tables of equal-length columns, and a child
+# table points to the row of its parent (net_wires.net, net_points.wire, ...).
+# Every name (instance, cell, net, pin, layer, via, orientation, ...) is an
+# int32 index in a single string dictionary stored once, -1 for none.
+#
+#   .npz    one '<table>.<column>' array each, stored uncompressed so that
+#           load_npz maps them from the file instead of reading them
+#   Arrow   one IPC file per table in a directory (when pyarrow is installed),
+#           mapped by load_arrow
+#
+#   def_export.export_npz(results, 'design.npz')
+#   design = def_export.load_npz('design.npz')
+#   design.tables['components']['x'], design.decode(design.tables['components']['cell'])
+
+# Columns of each table, in order
+TABLES = {'design': ('name', 'dbuPerMicron'),
+          'diearea': ('x', 'y'),
+          'components': ('name', 'cell', 'status', 'orient', 'x', 'y'),
+          'pins': ('name', 'net', 'direction', 'use', 'status', 'orient', 'x', 'y'),
+          'pin_shapes': ('pin', 'layer', 'x0', 'y0', 'x1', 'y1'),
+          'nets': ('name',),
+          'net_connections': ('net', 'comp', 'pin'),
+          'net_wires': ('net', 'layer'),
+          'net_points': ('wire', 'x', 'y', 'via'),
+          'specialnets': ('name', 'use'),
+          'specialnet_connections': ('net', 'comp', 'pin'),
+          'specialnet_wires': ('net', 'layer', 'width', 'shape'),
+          'specialnet_points': ('wire', 'x', 'y', 'via'),
+         }
+INT_COLUMNS = ('x', 'y', 'x0', 'y0', 'x1', 'y1', 'width')  # int64, the others are int32 except dbuPerMicron
+PLACEMENTS = ('PLACED', 'FIXED', 'COVER', 'UNPLACED')
+
+
+# The string dictionary being built: each string gets the index of its first occurrence
+class StringTable:
+    #
+    def __init__(self):
+        self.ids = {}
+
+    # Index of string, -1 for None
+    def intern(self, string):
+        if string is None:
+            return -1
+        return self.ids.setdefault(string, len(self.ids))
+
+    # Return the indices of ids in strings (a per-table list of names) as
+    # indices in this table; -1 stays -1
+    def remap(self, strings, ids):
+        remap = np.array([self.intern(s) for s in strings] + [-1], dtype=np.int32)
+        return remap[ids]
+
+    # (data, offsets): the utf-8 strings concatenated, string i being data[offsets[i]:offsets[i + 1]]
+    def arrays(self):
+        encoded = [string.encode() for string in self.ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+# Build the columns of a table from rows, (value, ...) tuples in TABLES order
+def _table(name, rows):
+    columns = list(zip(*rows)) or [()] * len(TABLES[name])
+    table = {}
+    for column, values in zip(TABLES[name], columns):
+        if name == 'design' and column == 'dbuPerMicron':
+            dtype = np.float64
+        else:
+            dtype = np.int64 if column in INT_COLUMNS else np.int32
+        table[column] = np.array(values, dtype=dtype)
+    return table
+
+
+#
+def _components(result, strings):
+    table = result.get('table')
+    if table is None:
+        table = ComponentTable.from_records(result.get('subcomponents', []))
+    status_ids = np.array([strings.intern(s or None) for s in STATUSES], dtype=np.int32)
+    orient_ids = np.array([strings.intern(o) for o in ORIENTS], dtype=np.int32)
+    orient = np.full(len(table), -1, dtype=np.int32)
+    placed = table.orient != ORIENT_NONE
+    orient[placed] = orient_ids[table.orient[placed]]
+    return {'name': np.array([strings.intern(name) for name in table.names()], dtype=np.int32),
+            'cell': strings.remap(table.cells, table.cell_id),
+            'status': status_ids[table.status],
+            'orient': orient,
+            'x': np.asarray(table.x, dtype=np.int64),
+            'y': np.asarray(table.y, dtype=np.int64),
+           }
+
+
+#
+def _pins(result, strings):
+    pins, shapes = [], []
+    for i, pin in enumerate(result.get('pin', [])):
+        status = orient = None
+        x = y = 0
+        for item in pin.get('PLACEMENT', []):
+            if not isinstance(item, dict):
+                continue  # 'PORT'
+            if 'LAYER' in item:
+                (x0, y0), (x1, y1) = item['LAYER']['coord'][:2]
+                shapes.append((i, strings.intern(item['LAYER']['layerName']), x0, y0, x1, y1))
+            for name in PLACEMENTS:
+                if name in item and status is None:  # the first one of the first PORT
+                    status = name
+                    x, y = item[name].get('coord', (0, 0))[:2]
+                    orient = item[name].get('orient')
+        pins.append((strings.intern(pin.get('pin_name')), strings.intern(pin.get('netName')),
+                     strings.intern(pin.get('DIRECTION')), strings.intern(pin.get('USE')),
+                     strings.intern(status), strings.intern(orient), x, y))
+    return _table('pins', pins), _table('pin_shapes', shapes)
+
+
+#
+def _nets(result, strings):
+    table = result.get('table')
+    if table is None:
+        table = NetTable.from_records(result.get('net', []))
+    net_of = lambda start: np.repeat(np.arange(len(start) - 1, dtype=np.int32), np.diff(start))
+    return ({'name': np.array([strings.intern(name) for name in table.names()], dtype=np.int32)},
+            {'net': net_of(table.conn_start),
+             'comp': strings.remap(table.comps, table.conn_comp),
+             'pin': strings.remap(table.pins, table.conn_pin)},
+            {'net': net_of(table.wire_start),
+             'layer': strings.remap(table.layers, table.wire_layer)},
+            {'wire': net_of(table.point_start),
+             'x': np.asarray(table.x, dtype=np.int64),
+             'y': np.asarray(table.y, dtype=np.int64),
+             'via': strings.remap(table.vias, table.via_id)})
+
+
+# The wires of a special net: the ROUTED one and its NEW wires, as dicts
+# with layerName, routeWidth, SHAPE and routingPoints
+def _special_wires(net):
+    wiring = net.get('specialWiring') or {}
+    wires = [wiring] if 'routingPoints' in wiring else []
+    new = wiring.get('NEW')
+    if isinstance(new, list) and new and isinstance(new[-1], list):
+        wires += [wire for wire in new[-1] if isinstance(wire, dict)]
+    return wires
+
+
+#
+def _specialnets(result, strings):
+    nets, conns, wires, points = [], [], [], []
+    for i, net in enumerate(result.get('specialnets', [])):
+        nets.append((strings.intern(net.get('netName')), strings.intern(net.get('USE'))))
+        for conn in net.get('nets', []):
+            conns.append((i, strings.intern(conn.get('compName')), strings.intern(conn.get('pinName'))))
+        for wire in _special_wires(net):
+            w = len(wires)
+            wires.append((i, strings.intern(wire.get('layerName')), int(wire.get('routeWidth', 0)),
+                          strings.intern(wire.get('SHAPE'))))
+            points += [(w, x, y, strings.intern(via)) for x, y, via in wire_points(wire['routingPoints'])]
+    return (_table('specialnets', nets), _table('specialnet_connections', conns),
+            _table('specialnet_wires', wires), _table('specialnet_points', points))
+
+
+# Return ({table: {column: array}}, strings) of the results of a parse. Only
+# the tables of the sections present in results are built.
+def columns(results):
+    strings = StringTable()
+    tables = {}
+    if 'DESIGN' in results or 'dbuPerMicron' in results:
+        tables['design'] = _table('design', [(strings.intern(results.get('DESIGN')),
+                                              float(results.get('dbuPerMicron', 0)))])
+    if results.get('DIEAREA'):
+        points, x, y = results['DIEAREA'], [], []
+        for i in range(0, len(points) - 1, 2):
+            x.append(x[-1] if points[i] == '*' else points[i])
+            y.append(y[-1] if points[i + 1] == '*' else points[i + 1])
+        tables['diearea'] = _table('diearea', zip(x, y))
+    if results.get('COMPONENTS'):
+        tables['components'] = _components(results['COMPONENTS'], strings)
+    if results.get('PINS'):
+        tables['pins'], tables['pin_shapes'] = _pins(results['PINS'], strings)
+    if results.get('NETS'):
+        (tables['nets'], tables['net_connections'], tables['net_wires'],
+         tables['net_points']) = _nets(results['NETS'], strings)
+    if results.get('SPECIALNETS'):
+        (tables['specialnets'], tables['specialnet_connections'], tables['specialnet_wires'],
+         tables['specialnet_points']) = _specialnets(results['SPECIALNETS'], strings)
+    return tables, strings.arrays()
+
+
+# Exported tables loaded back: the arrays are mapped from the file
+class ColumnarDesign:
+    #
+    def __init__(self, tables, string_data, string_offsets):
+        self.tables = tables
+        self.string_data = string_data
+        self.string_offsets = string_offsets
+
+    # The string of index i of the dictionary, None for -1
+    def string(self, i):
+        if i < 0:
+            return None
+        return self.string_data[self.string_offsets[i]:self.string_offsets[i + 1]].tobytes().decode()
+
+    # The strings of an array of indices
+    def decode(self, ids):
+        return [self.string(i) for i in ids]
+
+
+# Write the results of a parse to path as an uncompressed .npz
+def export_npz(results, path):
+    tables, (string_data, string_offsets) = columns(results)
+    arrays = {'strings.data': string_data, 'strings.offsets': string_offsets}
+    for table, table_columns in tables.items():
+        for column, array in table_columns.items():
+            arrays[table + '.' + column] = array
+    np.savez(path, **arrays)
+
+
+# Offset in the .npz file (a zip of .npy files) of the data of each array,
+# with its dtype, shape and order
+def _npz_layout(path):
+    layout = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as ifile:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('%s: %s is compressed, it can not be mapped' % (path, info.filename))
+            ifile.seek(info.header_offset + 26)
+            name_size, extra_size = struct.unpack('<HH', ifile.read(4))
+            ifile.seek(info.header_offset + 30 + name_size + extra_size)
+            version = np.lib.format.read_magic(ifile)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(ifile)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(ifile)
+            layout[info.filename[:-len('.npy')]] = (ifile.tell(), dtype, shape, fortran_order)
+    return layout
+
+
+# Load a .npz written by export_npz. The arrays are mapped from the file,
+# so only the pages actually read are loaded
+def load_npz(path):
+    with open(path, 'rb') as ifile:
+        buffer = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+    tables = {}
+    strings = {}
+    for name, (offset, dtype, shape, fortran_order) in _npz_layout(path).items():
+        array = np.ndarray(shape, dtype, buffer=buffer, offset=offset, order='F' if fortran_order else 'C')
+        table, column = name.split('.', 1)
+        if table == 'strings':
+            strings[column] = array
+        else:
+            tables.setdefault(table, {})[column] = array
+    return ColumnarDesign(tables, strings['data'], strings['offsets'])
+
+
+# Write the results of a parse to directory, one Arrow IPC file per table
+# plus strings.arrow, the string dictionary. Needs pyarrow.
+def export_arrow(results, directory):
+    import pyarrow as pa
+    tables, (string_data, string_offsets) = columns(results)
+    os.makedirs(directory, exist_ok=True)
+    strings = pa.LargeStringArray.from_buffers(len(string_offsets) - 1, pa.py_buffer(string_offsets),
+                                               pa.py_buffer(string_data))
+    tables['strings'] = {'string': strings}
+    for table, table_columns in tables.items():
+        arrow_table = pa.table({column: pa.array(array) if isinstance(array, np.ndarray) else array
+                                for column, array in table_columns.items()})
+        with pa.OSFile(os.path.join(directory, table + '.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+
+
+# Load a directory written by export_arrow; the columns are mapped from the files
+def load_arrow(directory):
+    import pyarrow as pa
+    tables = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.arrow'):
+            continue
+        with pa.memory_map(os.path.join(directory, filename)) as source:
+            arrow_table = pa.ipc.open_file(source).read_all()
+        tables[filename[:-len('.arrow')]] = arrow_table
+
+    strings = tables.pop('strings').column('string').combine_chunks()
+    buffers = strings.buffers()
+    string_offsets = np.frombuffer(buffers[1], dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+    string_data = np.frombuffer(buffers[2], dtype=np.uint8) if buffers[2] is not None else np.zeros(0, np.uint8)
+    columns = {table: {name: arrow_table.column(name).to_numpy() for name in arrow_table.column_names}
+               for table, arrow_table in tables.items()}
+    return ColumnarDesign(columns, string_data, string_offsets)
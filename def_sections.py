@@ -0,0 +1,284 @@
+import re
+
+# Sections delimited by "<NAME> ... END <NAME>"
+BLOCK_SECTIONS = ('PROPERTYDEFINITIONS', 'VIAS', 'STYLES', 'NONDEFAULTRULES',
+                  'REGIONS', 'COMPONENTMASKSHIFT', 'COMPONENTS', 'PINS',
+                  'PINPROPERTIES', 'BLOCKAGES', 'SLOTS', 'FILLS', 'SPECIALNETS',
+                  'NETS', 'SCANCHAINS', 'GROUPS', 'BEGINEXT')
+
+# Keyword of the DEF statement parsed by each DefParser.parse_<section>
+SECTION_KEYWORDS = {'design': 'DESIGN',
+                    'dbuPerMicron': 'UNITS',
+                    'diearea': 'DIEAREA',
+                    'components': 'COMPONENTS',
+                    'pins': 'PINS',
+                    'nets': 'NETS',
+                    'specialnets': 'SPECIALNETS',
+                   }
+
+# The functions below accept the .DEF file as a str or as bytes-like data
+# (bytes, mmap), in which case the offsets are byte offsets
+_SKIP = r'(?:\s+|#[^\n]*)*'
+_KEYWORD = r'[A-Z][A-Z0-9_]*'
+_RECORD = r'^[ \t]*-(?=\s)'
+_NEW = r'(?<=\s)NEW(?=\s)'
+# '+ ROUTED ...' and the other clauses starting a special wiring
+_WIRING = r'(?<=\s)\+\s+(?:COVER|FIXED|ROUTED|SHIELD|POLYGON|RECT|VIA)(?=\s)'
+# Any clause but the '+ SHAPE' and '+ STYLE' options of a NEW wire
+_CLAUSE = r'(?<=\s)\+\s+(?!(?:SHAPE|STYLE)\s)'
+_res = {}
+
+
+#
+def _re(pattern, def_string, flags=0):
+    binary = not isinstance(def_string, str)
+    key = (pattern, binary, flags)
+    if key not in _res:
+        _res[key] = re.compile(pattern.encode() if binary else pattern, flags)
+    return _res[key]
+
+
+#
+def _end_re(keyword, def_string):
+    end_keyword = 'ENDEXT' if keyword == 'BEGINEXT' else 'END[ \t]+' + keyword
+    return _re(r'^[ \t]*' + end_keyword + r'\b[^\n]*\n?', def_string, re.M)
+
+
+#
+def _str(text):
+    return text if isinstance(text, str) else bytes(text).decode()
+
+
+#
+def _find(def_string, char, pos):
+    return def_string.find(char if isinstance(def_string, str) else char.encode(), pos)
+
+
+# Build the section offset index of a .DEF file in a single pass.
+# Returns {keyword: (start, end)} where def_string[start:end] holds the whole
+# statement ('DIEAREA ... ;') or block ('COMPONENTS ... END COMPONENTS').
+# Repeated statements (ROW, TRACKS, GCELLGRID, ...) span from the first to the last one.
+def index_sections(def_string):
+    skip_re = _re(_SKIP, def_string)
+    keyword_re = _re(_KEYWORD, def_string)
+    index = {}
+    pos = 0
+    size = len(def_string)
+    while pos < size:
+        pos = skip_re.match(def_string, pos).end()
+        m = keyword_re.match(def_string, pos)
+        if m is None:
+            # Not a statement we know how to delimit: resync on the next line
+            nl = _find(def_string, '\n', pos)
+            if nl < 0:
+                break
+            pos = nl + 1
+            continue
+
+        keyword = _str(m.group())
+        if keyword == 'END':
+            break  # END DESIGN
+
+        if keyword in BLOCK_SECTIONS:
+            m_end = _end_re(keyword, def_string).search(def_string, m.end())
+            end = m_end.end() if m_end else size
+        else:
+            semicolon = _find(def_string, ';', m.end())
+            if semicolon < 0:
+                end = size
+            else:
+                nl = _find(def_string, '\n', semicolon)
+                end = size if nl < 0 else nl + 1
+
+        if keyword in index:
+            index[keyword] = (index[keyword][0], end)
+        else:
+            index[keyword] = (pos, end)
+        pos = end
+
+    return index
+
+
+# Return the (start, end) offsets that the parse_<section> grammar must scan.
+# Falls back to the whole string when the section is not in the index.
+def section_span(def_string, section_index, section):
+    keyword = SECTION_KEYWORDS.get(section, section)
+    if section_index is None or keyword not in section_index:
+        return 0, len(def_string)
+    return section_index[keyword]
+
+
+# Return def_string[start:end] as a str, decoding it if the file is bytes-like.
+# Only the slices that are actually parsed are ever decoded.
+def text_slice(def_string, start, end):
+    if isinstance(def_string, str) and start == 0 and end == len(def_string):
+        return def_string
+    return _str(def_string[start:end])
+
+
+# Return the part of def_string that the parse_<section> grammar must scan.
+def section_slice(def_string, section_index, section):
+    start, end = section_span(def_string, section_index, section)
+    return text_slice(def_string, start, end)
+
+
+# Split the body of a block section ('COMPONENTS 25203 ; - ... ; END COMPONENTS')
+# held in def_string[start:end] in about n_chunks pieces, cutting only at
+# record boundaries ('- name ...'). Returns (body_start, spans):
+# def_string[start:body_start] is the header and every def_string[a:b] in
+# spans holds whole records, in file order.
+def split_records(def_string, n_chunks, start=0, end=None):
+    end = len(def_string) if end is None else end
+    record_re = _re(_RECORD, def_string, re.M)
+    pos = _re(_SKIP, def_string).match(def_string, start).end()
+    keyword = _re(_KEYWORD, def_string).match(def_string, pos)
+    m_end = _end_re(_str(keyword.group()), def_string).search(def_string, pos, end) if keyword else None
+    body_end = m_end.start() if m_end else end
+    m_first = record_re.search(def_string, start, body_end)
+    if m_first is None:
+        return body_end, []
+
+    body_start = m_first.start()
+    step = max(1, (body_end - body_start) // max(1, n_chunks))
+    spans = []
+    pos = body_start
+    while pos < body_end:
+        m = record_re.search(def_string, min(pos + step, body_end), body_end)
+        chunk_end = m.start() if m else body_end
+        spans.append((pos, chunk_end))
+        pos = chunk_end
+
+    return body_start, spans
+
+
+# Return the (start, end) span of every record of the block section held in
+# def_string[start:end], in file order
+def record_spans(def_string, start=0, end=None):
+    body_start, spans = split_records(def_string, 1, start, end)
+    body_end = spans[-1][1] if spans else body_start
+    starts = [m.start() for m in _re(_RECORD, def_string, re.M).finditer(def_string, body_start, body_end)]
+    return list(zip(starts, starts[1:] + [body_end]))
+
+
+# Return the offsets of the 'NEW' keywords of the SPECIALNETS record held in
+# def_string[start:end] when it can be split at them: a single wiring
+# ('+ ROUTED ... NEW ... NEW ...') with at least two NEW wires, and no other
+# clause before the last one. Returns None otherwise.
+def split_wires(def_string, start, end):
+    if len(_re(_WIRING, def_string).findall(def_string, start, end)) != 1:
+        return None
+    news = [m.start() for m in _re(_NEW, def_string).finditer(def_string, start, end)]
+    if len(news) < 2 or _re(_CLAUSE, def_string).search(def_string, news[0], news[-1]):
+        return None
+    return news
+
+
+# Return the offset where the record starting at pos ends, i.e. the start of
+# the next '- name ...' record, or len(section_string) for the last one
+def record_end(section_string, pos):
+    m = _re(_RECORD, section_string, re.M).search(section_string, pos + 1)
+    return m.start() if m else len(section_string)
+
+
+# Yield (offset, text) of each '- name ... ;' record of the block section
+# keyword ('COMPONENTS', 'NETS', ...) while reading the lines of a .DEF file
+# one at a time, so a record is available as soon as its last line has been
+# read. offset is the position of the record in the concatenated lines.
+def iter_section_records(lines, keyword):
+    keyword_re = _re(_KEYWORD, '')
+    skip_re = _re(_SKIP, '')
+    record_re = _re(_RECORD, '', re.M)
+    block = None
+    record = []
+    record_start = 0
+    pos = 0
+    for line in lines:
+        line_start = pos
+        pos += len(line)
+        if block is None:
+            m = keyword_re.match(line, skip_re.match(line).end())
+            if m is None:
+                continue
+            if m.group() == 'END':
+                return  # END DESIGN
+            if m.group() in BLOCK_SECTIONS:
+                block = m.group()
+            continue
+
+        if _end_re(block, line).match(line):
+            if block == keyword:
+                break
+            block = None
+        elif block != keyword:
+            continue
+        elif record_re.match(line):
+            if record:
+                yield record_start, ''.join(record)
+            record = [line]
+            record_start = line_start
+        elif record:
+            record.append(line)
+
+    if record:
+        yield record_start, ''.join(record)
+
+
+# Yield (keyword, kind, offset, text) while reading the lines of a .DEF file
+# one at a time, for the statements of keywords ('DIEAREA', 'NETS', ...):
+#   'statement'  a whole statement outside the block sections ('DIEAREA ... ;')
+#   'header'     the first line of a block section ('NETS 13417 ;')
+#   'record'     each '- name ... ;' record of a block section, as in iter_section_records
+def iter_statements(lines, keywords):
+    keyword_re = _re(_KEYWORD, '')
+    skip_re = _re(_SKIP, '')
+    record_re = _re(_RECORD, '', re.M)
+    block = None
+    statement = None  # [keyword, offset, lines] of a statement longer than a line
+    record = []
+    record_start = 0
+    pos = 0
+    for line in lines:
+        line_start = pos
+        pos += len(line)
+        if statement is not None:
+            statement[2].append(line)
+            if ';' in line:
+                yield statement[0], 'statement', statement[1], ''.join(statement[2])
+                statement = None
+            continue
+
+        if block is None:
+            m = keyword_re.match(line, skip_re.match(line).end())
+            if m is None:
+                continue
+            keyword = m.group()
+            if keyword == 'END':
+                return  # END DESIGN
+            if keyword in BLOCK_SECTIONS:
+                block = keyword
+                if keyword in keywords:
+                    yield keyword, 'header', line_start, line
+            elif keyword in keywords:
+                if ';' in line:
+                    yield keyword, 'statement', line_start, line
+                else:
+                    statement = [keyword, line_start, [line]]
+            continue
+
+        if _end_re(block, line).match(line):
+            if record:
+                yield block, 'record', record_start, ''.join(record)
+                record = []
+            block = None
+        elif block not in keywords:
+            continue
+        elif record_re.match(line):
+            if record:
+                yield block, 'record', record_start, ''.join(record)
+            record = [line]
+            record_start = line_start
+        elif record:
+            record.append(line)
+
+    if record:
+        yield block, 'record', record_start, ''.join(record)
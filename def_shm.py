@@ -0,0 +1,75 @@
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from def_table import ComponentTable, NetTable
+
+# Tables sent back by the pool workers through shared memory (DefParser.shared_results)
+TABLES = (ComponentTable, NetTable)
+ALIGN = 64  # bytes, offset of each array in the block
+
+
+# Block attached by the parent. Its mapping must not be closed while arrays
+# are built on it: they hold its mmap, so the mapping goes away with the last
+# array. Only the file descriptor is closed.
+class _AttachedMemory(shared_memory.SharedMemory):
+    #
+    def __del__(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# Picklable handle of a table whose NumPy arrays were copied in a
+# shared_memory block by a worker. Only the block name, the layout of the
+# arrays and the (small) interned string lists go through the pipe.
+class SharedTable:
+    #
+    def __init__(self, table):
+        arrays = {name: value for name, value in vars(table).items() if isinstance(value, np.ndarray)}
+        self.cls = type(table)
+        self.attrs = {name: value for name, value in vars(table).items() if name not in arrays}
+        self.layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            self.layout[name] = (array.dtype.str, array.shape, offset)
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, array in arrays.items():
+            dtype, shape, start = self.layout[name]
+            np.ndarray(shape, dtype, buffer=block.buf, offset=start)[...] = array
+        self.name = block.name
+        block.close()  # the block itself stays until attach() unlinks it
+
+    # Return the table with its arrays mapped on the block, without copying
+    # them. The block is unlinked at once and freed with its last array.
+    def attach(self):
+        block = _AttachedMemory(name=self.name)
+        block.unlink()
+        table = self.cls.__new__(self.cls)
+        table.__dict__.update(self.attrs)
+        for name, (dtype, shape, offset) in self.layout.items():
+            setattr(table, name, np.ndarray(shape, dtype, buffer=block.buf, offset=offset))
+        return table
+
+
+# Replace the tables of results (a table, or a results dict of dicts) by
+# SharedTable handles. Called by the worker before returning results.
+def share(results):
+    if isinstance(results, TABLES):
+        return SharedTable(results)
+    if isinstance(results, dict):
+        return {key: share(value) for key, value in results.items()}
+    return results
+
+
+# Replace the SharedTable handles of results by the attached tables.
+# Called by the parent on the results of the worker.
+def attach(results):
+    if isinstance(results, SharedTable):
+        return results.attach()
+    if isinstance(results, dict):
+        return {key: attach(value) for key, value in results.items()}
+    return results
@@ -0,0 +1,79 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+# Compact results of the windows of a bounded-memory parse (DefParser with
+# memory_budget). Each window result (records or a def_table table) is kept
+# pickled, which is a fraction of the size of its dicts. When the pickles
+# held reach max_bytes they are appended to one temporary file per section,
+# then read back in file order when the sections are merged.
+
+# Parsing a window takes about this many bytes per character of the window
+# (ParseResults, asDict copy and records, measured on COMPONENTS, PINS, NETS
+# and SPECIALNETS), so a window is budget // WINDOW_FRACTION characters and
+# the pickles held the other half of the budget
+PARSE_BYTES_PER_CHAR = 80
+WINDOW_FRACTION = 2 * PARSE_BYTES_PER_CHAR
+
+
+#
+class SpillStore:
+    #
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = tempfile.mkdtemp(prefix='def_spill_', dir=directory)
+        self.kinds = {}  # section -> kind of each result, see DefParser.plan_chunks
+        self.held = {}  # section -> pickles not spilled yet
+        self.held_bytes = 0
+        self.spilled = {}  # section -> number of results in its file
+        self.spilled_bytes = 0
+
+    # Add the result of the next window of section
+    def add(self, section, kind, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self.kinds.setdefault(section, []).append(kind)
+        self.held.setdefault(section, []).append(data)
+        self.held_bytes += len(data)
+        if self.held_bytes >= self.max_bytes:
+            self.spill()
+
+    # Append the pickles held to the files of their section
+    def spill(self):
+        for section, chunks in self.held.items():
+            with open(self.path(section), 'ab') as ofile:
+                for data in chunks:
+                    ofile.write(data)
+            self.spilled[section] = self.spilled.get(section, 0) + len(chunks)
+        self.spilled_bytes += self.held_bytes
+        self.held = {}
+        self.held_bytes = 0
+
+    #
+    def path(self, section):
+        return os.path.join(self.directory, section + '.pickle')
+
+    # The (kind, spans) plan of the results of section, for DefParser.merge_records
+    def plan(self, section):
+        return [(kind, None) for kind in self.kinds.get(section, [])]
+
+    # Yield the results of section in the order they were added
+    def load(self, section):
+        if self.spilled.get(section):
+            with open(self.path(section), 'rb') as ifile:
+                for _ in range(self.spilled[section]):
+                    yield pickle.load(ifile)
+        for data in self.held.get(section, []):
+            yield pickle.loads(data)
+
+    # Remove the temporary files
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    #
+    def __enter__(self):
+        return self
+
+    #
+    def __exit__(self, *exc):
+        self.close()
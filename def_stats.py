@@ -0,0 +1,118 @@
+import json
+import os
+import resource
+import time
+
+# Times are in seconds
+TIMES = ('grammar_s', 'scan_s', 'asdict_s', 'ipc_s')
+
+
+# Peak RSS of this process so far, in MB
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Measures of one section (or one chunk of a section) parsed by one process:
+#   grammar_s   building the grammar (0 when it was prebuilt before the fork)
+#   scan_s      scanString / parseString, or the fast path
+#   asdict_s    converting the tokens with asDict
+#   ipc_s       from the end of the task in the worker to the results being
+#               available in the parent (pickling, pipe, unpickling)
+#   records     number of records (1 for the simple statements)
+#   peak_rss_mb peak RSS of the process when the section was done
+class SectionStats:
+    #
+    def __init__(self, section, chunk=None):
+        self.section = section
+        self.chunk = chunk  # offset of the chunk in the file, None for the whole section
+        self.worker = os.getpid()
+        self.grammar_s = 0.0
+        self.scan_s = 0.0
+        self.asdict_s = 0.0
+        self.ipc_s = 0.0
+        self.records = 0
+        self.peak_rss_mb = 0.0
+        self.sent = None
+
+    # Called by the process that parsed the section when it is done
+    def done(self, records):
+        self.records = records
+        self.peak_rss_mb = peak_rss_mb()
+
+    # Called by the parent when the results of the section arrive
+    def received(self):
+        if self.sent is not None and self.worker != os.getpid():
+            self.ipc_s = max(0.0, time.time() - self.sent)
+
+    #
+    def as_dict(self):
+        return {'section': self.section,
+                'chunk': self.chunk,
+                'worker': self.worker,
+                'grammar_s': round(self.grammar_s, 6),
+                'scan_s': round(self.scan_s, 6),
+                'asdict_s': round(self.asdict_s, 6),
+                'ipc_s': round(self.ipc_s, 6),
+                'records': self.records,
+                'peak_rss_mb': round(self.peak_rss_mb, 1),
+               }
+
+
+# Called by a pool task returning (results, [SectionStats]) just before it returns
+def sent_stats(stats):
+    now = time.time()
+    for section_stats in stats:
+        section_stats.sent = now
+    return stats
+
+
+# Pool callback of the tasks returning (results, [SectionStats])
+def received_stats(output):
+    for stats in output[1]:
+        stats.received()
+
+
+# Measures of the parse of a .DEF file, one SectionStats per section or chunk
+class ParseStats:
+    #
+    def __init__(self, path=None, sections=()):
+        self.path = path
+        self.sections = list(sections)
+
+    # Sum the measures of the entries sharing the same attribute (section or worker)
+    def totals(self, key='section'):
+        totals = {}
+        for stats in self.sections:
+            total = totals.setdefault(getattr(stats, key), dict.fromkeys(TIMES, 0.0))
+            for name in TIMES:
+                total[name] += getattr(stats, name)
+            total['records'] = total.get('records', 0) + stats.records
+            total['peak_rss_mb'] = max(total.get('peak_rss_mb', 0.0), stats.peak_rss_mb)
+            total.setdefault('workers', set()).add(stats.worker)
+        return totals
+
+    #
+    def by_section(self):
+        return self.totals('section')
+
+    #
+    def by_worker(self):
+        return self.totals('worker')
+
+    # Append one JSON line per section or chunk to path
+    def write_jsonl(self, path):
+        with open(path, 'a') as ofile:
+            for stats in self.sections:
+                line = {'file': self.path}
+                line.update(stats.as_dict())
+                ofile.write(json.dumps(line) + '\n')
+
+    #
+    def __str__(self):
+        lines = ['%-18s %9s %9s %9s %9s %10s %8s %8s' % ('section', 'grammar', 'scan', 'asDict', 'ipc',
+                                                         'records', 'peak MB', 'workers')]
+        for section, total in self.by_section().items():
+            lines.append('%-18s %9.3f %9.3f %9.3f %9.3f %10d %8.1f %8d' % (
+                section, total['grammar_s'], total['scan_s'], total['asdict_s'], total['ipc_s'],
+                total['records'], total['peak_rss_mb'], len(total['workers'])))
+        return '\n'.join(lines)
@@ -0,0 +1,294 @@
+import numpy as np
+
+# Codes of the 'orientation' column, ORIENT_NONE when the component has none
+ORIENTS = ('N', 'S', 'E', 'W', 'FN', 'FS', 'FE', 'FW')
+ORIENT_CODES = {orient: code for code, orient in enumerate(ORIENTS)}
+ORIENT_NONE = 255
+
+# Codes of the 'status' column, 0 when the component has no PLACEMENT
+STATUSES = ('', 'FIXED', 'COVER', 'PLACED', 'UNPLACED')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+# Return the (name, cell, status, x, y, orient) row of a COMPONENTS record dict
+def component_row(comp):
+    placement = comp.get('PLACEMENT') or [None]
+    return (comp['comp_name'], comp['cell'], placement[0],
+            int(comp.get('placement_x', 0)), int(comp.get('placement_y', 0)),
+            comp.get('orientation'))
+
+
+# Columnar store of the COMPONENTS section: one NumPy array per attribute
+# instead of one dict per instance.
+#   x, y      int64 placement in DBU (0 when unplaced)
+#   orient    uint8 index in ORIENTS
+#   status    uint8 index in STATUSES
+#   cell_id   int32 index in cells, the interned cell-master names
+#   names     instance names, stored as one utf-8 buffer (name_data) sliced
+#             by name_offsets
+class ComponentTable:
+    #
+    def __init__(self, name_data, name_offsets, cells, cell_id, status, x, y, orient):
+        self.name_data = name_data
+        self.name_offsets = name_offsets
+        self.cells = cells
+        self.cell_id = cell_id
+        self.status = status
+        self.x = x
+        self.y = y
+        self.orient = orient
+
+    # Build a table from per-column lists: names and cells are str, status and
+    # orient are str or None, x and y int or str. The conversions are batched.
+    @classmethod
+    def from_columns(cls, names, cells, status, x, y, orient):
+        encoded = [name.encode() for name in names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        name_data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        cell_codes = {}
+        cell_id = np.array([cell_codes.setdefault(cell, len(cell_codes)) for cell in cells], dtype=np.int32)
+        status = np.array([STATUS_CODES[s or ''] for s in status], dtype=np.uint8)
+        orient = np.array([ORIENT_CODES.get(o, ORIENT_NONE) for o in orient], dtype=np.uint8)
+
+        return cls(name_data, name_offsets, list(cell_codes), cell_id, status,
+                   np.array(x).astype(np.int64), np.array(y).astype(np.int64), orient)
+
+    # Build a table from (name, cell, status, x, y, orient) rows
+    @classmethod
+    def from_rows(cls, rows):
+        columns = list(zip(*rows)) or [[], [], [], [], [], []]
+        return cls.from_columns(*columns)
+
+    # Build a table from the records of DefParser.parse_components_chunk
+    @classmethod
+    def from_records(cls, records):
+        return cls.from_rows([component_row(comp) for comp in records])
+
+    # Concatenate tables (e.g. the chunks of a parallel parse) re-interning the cells
+    @classmethod
+    def concatenate(cls, tables):
+        cells = {}
+        cell_ids = []
+        name_offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for table in tables:
+            remap = np.array([cells.setdefault(cell, len(cells)) for cell in table.cells], dtype=np.int32)
+            cell_ids.append(remap[table.cell_id] if len(remap) else table.cell_id)
+            name_offsets.append(table.name_offsets[1:] + base)
+            base += len(table.name_data)
+
+        return cls(np.concatenate([t.name_data for t in tables] or [np.zeros(0, np.uint8)]),
+                   np.concatenate(name_offsets),
+                   list(cells),
+                   np.concatenate(cell_ids or [np.zeros(0, np.int32)]),
+                   np.concatenate([t.status for t in tables] or [np.zeros(0, np.uint8)]),
+                   np.concatenate([t.x for t in tables] or [np.zeros(0, np.int64)]),
+                   np.concatenate([t.y for t in tables] or [np.zeros(0, np.int64)]),
+                   np.concatenate([t.orient for t in tables] or [np.zeros(0, np.uint8)]))
+
+    #
+    def __len__(self):
+        return len(self.cell_id)
+
+    # Instance name of the i-th component
+    def name(self, i):
+        return self.name_data[self.name_offsets[i]:self.name_offsets[i + 1]].tobytes().decode()
+
+    #
+    def names(self):
+        return [self.name(i) for i in range(len(self))]
+
+    # Cell-master name of the i-th component
+    def cell(self, i):
+        return self.cells[self.cell_id[i]]
+
+    # Rebuild the i-th component as the dict of the placement fields
+    def record(self, i):
+        comp = {'comp_name': self.name(i), 'cell': self.cell(i)}
+        if self.status[i]:
+            comp['status'] = STATUSES[self.status[i]]
+        if self.orient[i] != ORIENT_NONE:
+            comp['placement_x'] = int(self.x[i])
+            comp['placement_y'] = int(self.y[i])
+            comp['orientation'] = ORIENTS[self.orient[i]]
+        return comp
+
+    # Boolean mask of the placed components whose origin is inside the box
+    def in_box(self, x0, y0, x1, y1):
+        return ((self.orient != ORIENT_NONE)
+                & (self.x >= x0) & (self.x <= x1)
+                & (self.y >= y0) & (self.y <= y1))
+
+    # Memory used by the arrays, in bytes
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.name_data, self.name_offsets, self.cell_id,
+                                      self.status, self.x, self.y, self.orient))
+
+
+# Return the (name, connections, wires) of a NETS record dict: connections are
+# (compName, pinName) pairs and wires (layerName, routingPoints) pairs
+def net_row(net):
+    value = net.get('netName', '')
+    name, conns = (value, []) if isinstance(value, str) else (value[0], value[1:])
+    conns = [(conn['compName'], conn['pinName']) for conn in conns if isinstance(conn, dict)]
+    wiring = net.get('WIRING') or {}
+    wires = [(wire['layerName'], wire.get('routingPoints', []))
+             for wire in wiring.get('WIRING_Head', []) + wiring.get('NEW_WIRING', [])]
+    return name, conns, wires
+
+
+# Return the (x, y, via) of the points of a routingPoints list, '*' being the
+# coordinate of the previous point. via is the name of the via placed at the
+# point or None. A '+' ends the wire: it is a clause the grammar took in.
+def wire_points(routing_points):
+    points = []
+    skip = False  # the pt of '( RECT dx1 dy1 dx2 dy2 )'
+    for item in routing_points:
+        if isinstance(item, list):
+            if skip:
+                skip = False
+            elif len(item) >= 2:
+                x, y = item[0], item[1]
+                if points:
+                    x = points[-1][0] if x == '*' else x
+                    y = points[-1][1] if y == '*' else y
+                points.append([int(x), int(y), None])
+        elif item == '+':
+            break
+        elif item == 'RECT':
+            skip = True
+        elif item in ORIENT_CODES:
+            continue  # the orientation of 'viaName orient', not kept
+        elif isinstance(item, str) and item not in ('MASK', 'VIRTUAL') and points:
+            points[-1][2] = item
+    return points
+
+
+# Columnar store of the NETS connectivity and regular wiring. The items of
+# the i-th net are items[start[i]:start[i + 1]] of each *_start array.
+#   names                net names, stored as in ComponentTable
+#   conn_start           int64 per net, into conn_comp and conn_pin
+#   conn_comp, conn_pin  int32 indices in comps and pins, the interned names
+#                        of the connections ('PIN' for the I/O pins)
+#   wire_start           int64 per net, into the wires (the ROUTED wire and its NEW wires)
+#   wire_layer           int32 index in layers
+#   point_start          int64 per wire, into the points
+#   x, y                 int64 routing points in DBU, '*' resolved
+#   via_id               int32 index in vias of the via at the point, -1 for none
+class NetTable:
+    #
+    def __init__(self, name_data, name_offsets, comps, pins, conn_start, conn_comp, conn_pin,
+                 layers, wire_start, wire_layer, vias, point_start, x, y, via_id):
+        self.name_data = name_data
+        self.name_offsets = name_offsets
+        self.comps = comps
+        self.pins = pins
+        self.conn_start = conn_start
+        self.conn_comp = conn_comp
+        self.conn_pin = conn_pin
+        self.layers = layers
+        self.wire_start = wire_start
+        self.wire_layer = wire_layer
+        self.vias = vias
+        self.point_start = point_start
+        self.x = x
+        self.y = y
+        self.via_id = via_id
+
+    # Build a table from the records of DefParser.parse_records_chunk('nets', ...)
+    @classmethod
+    def from_records(cls, records):
+        names = []
+        comps, pins, layers, vias = {}, {}, {}, {}
+        conn_start, conn_comp, conn_pin = [0], [], []
+        wire_start, wire_layer = [0], []
+        point_start, x, y, via_id = [0], [], [], []
+        for net in records:
+            name, conns, wires = net_row(net)
+            names.append(name.encode())
+            for comp, pin in conns:
+                conn_comp.append(comps.setdefault(comp, len(comps)))
+                conn_pin.append(pins.setdefault(pin, len(pins)))
+            conn_start.append(len(conn_comp))
+            for layer, routing_points in wires:
+                wire_layer.append(layers.setdefault(layer, len(layers)))
+                for px, py, via in wire_points(routing_points):
+                    x.append(px)
+                    y.append(py)
+                    via_id.append(-1 if via is None else vias.setdefault(via, len(vias)))
+                point_start.append(len(x))
+            wire_start.append(len(wire_layer))
+
+        name_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+        return cls(np.frombuffer(b''.join(names), dtype=np.uint8), name_offsets,
+                   list(comps), list(pins),
+                   np.array(conn_start, dtype=np.int64), np.array(conn_comp, dtype=np.int32),
+                   np.array(conn_pin, dtype=np.int32),
+                   list(layers), np.array(wire_start, dtype=np.int64), np.array(wire_layer, dtype=np.int32),
+                   list(vias), np.array(point_start, dtype=np.int64),
+                   np.array(x, dtype=np.int64), np.array(y, dtype=np.int64), np.array(via_id, dtype=np.int32))
+
+    # Concatenate tables (e.g. the chunks of a parallel parse) re-interning the names
+    @classmethod
+    def concatenate(cls, tables):
+        interned = {'comps': {}, 'pins': {}, 'layers': {}, 'vias': {}}
+        columns = {'name_data': [], 'name_offsets': [np.zeros(1, np.int64)],
+                   'conn_start': [np.zeros(1, np.int64)], 'conn_comp': [], 'conn_pin': [],
+                   'wire_start': [np.zeros(1, np.int64)], 'wire_layer': [],
+                   'point_start': [np.zeros(1, np.int64)], 'x': [], 'y': [], 'via_id': []}
+        bases = dict.fromkeys(('name_offsets', 'conn_start', 'wire_start', 'point_start'), 0)
+        for table in tables:
+            for strings, ids in (('comps', 'conn_comp'), ('pins', 'conn_pin'),
+                                 ('layers', 'wire_layer'), ('vias', 'via_id')):
+                codes = interned[strings]
+                remap = np.array([codes.setdefault(s, len(codes)) for s in getattr(table, strings)] + [-1],
+                                 dtype=np.int32)
+                columns[ids].append(remap[getattr(table, ids)])  # -1 (no via) stays -1
+            for name in bases:
+                offsets = getattr(table, name)
+                columns[name].append(offsets[1:] + bases[name])
+                bases[name] += int(offsets[-1])
+            for name in ('name_data', 'x', 'y'):
+                columns[name].append(getattr(table, name))
+
+        dtypes = {'name_data': np.uint8, 'x': np.int64, 'y': np.int64}
+        arrays = {name: np.concatenate(values or [np.zeros(0, dtypes.get(name, np.int32))])
+                  for name, values in columns.items()}
+        return cls(arrays['name_data'], arrays['name_offsets'],
+                   list(interned['comps']), list(interned['pins']),
+                   arrays['conn_start'], arrays['conn_comp'], arrays['conn_pin'],
+                   list(interned['layers']), arrays['wire_start'], arrays['wire_layer'],
+                   list(interned['vias']), arrays['point_start'], arrays['x'], arrays['y'], arrays['via_id'])
+
+    #
+    def __len__(self):
+        return len(self.name_offsets) - 1
+
+    # Name of the i-th net
+    def name(self, i):
+        return self.name_data[self.name_offsets[i]:self.name_offsets[i + 1]].tobytes().decode()
+
+    #
+    def names(self):
+        return [self.name(i) for i in range(len(self))]
+
+    # (compName, pinName) connections of the i-th net
+    def connections(self, i):
+        return [(self.comps[c], self.pins[p]) for c, p in zip(self.conn_comp[self.conn_start[i]:self.conn_start[i + 1]],
+                                                              self.conn_pin[self.conn_start[i]:self.conn_start[i + 1]])]
+
+    # Wire indices of the i-th net, for wire_points and wire_layer
+    def wires(self, i):
+        return range(self.wire_start[i], self.wire_start[i + 1])
+
+    # (x, y) arrays of the points of wire w
+    def points(self, w):
+        start, end = self.point_start[w], self.point_start[w + 1]
+        return self.x[start:end], self.y[start:end]
+
+    # Memory used by the arrays, in bytes
+    def nbytes(self):
+        return sum(a.nbytes for a in vars(self).values() if isinstance(a, np.ndarray))
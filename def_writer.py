@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+
+# NDJSON output: one compact JSON object per record and per line, written
+# as the records are parsed instead of dumping a whole section at once.
+#
+#   python3 def_writer.py example_1.def nets -o nets.ndjson --encoders 4
+
+BUFFER_SIZE = 1 << 20  # characters buffered before a write
+SEPARATORS = (',', ':')
+
+
+# Return the NDJSON text of records
+def encode_records(records):
+    return ''.join([json.dumps(record, separators=SEPARATORS) + '\n' for record in records])
+
+
+# Buffered NDJSON writer on a text file (a file, sys.stdout, ...), which it does not close
+class NDJSONWriter:
+    #
+    def __init__(self, ofile, buffer_size=BUFFER_SIZE):
+        self.ofile = ofile
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.size = 0
+        self.records = 0
+
+    #
+    def write(self, record):
+        self.write_encoded(json.dumps(record, separators=SEPARATORS) + '\n')
+
+    # Write records already encoded by encode_records
+    def write_encoded(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        self.records += text.count('\n')
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    #
+    def flush(self):
+        self.ofile.write(''.join(self.buffer))
+        self.ofile.flush()
+        self.buffer = []
+        self.size = 0
+
+    #
+    def __enter__(self):
+        return self
+
+    #
+    def __exit__(self, *exc):
+        self.flush()
+
+
+#
+def main():
+    from parser_def_1 import DefParser, RECORDS
+    parser = argparse.ArgumentParser(description='Write the records of a DEF section as NDJSON')
+    parser.add_argument('path')
+    parser.add_argument('section', choices=sorted(RECORDS))
+    parser.add_argument('-o', '--output', help='NDJSON file, stdout by default')
+    parser.add_argument('--encoders', type=int, default=0,
+                        help='worker processes parsing and encoding the chunks of the section')
+    args = parser.parse_args()
+
+    def_parser = DefParser()
+    if args.output is None:
+        def_parser.write_ndjson(args.path, args.section, sys.stdout, args.encoders)
+    else:
+        with open(args.output, 'w') as ofile:
+            def_parser.write_ndjson(args.path, args.section, ofile, args.encoders)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,23 @@
 import pyparsing as pp
 from collections import defaultdict
-from multiprocessing import (Process, Manager, Event)
+from multiprocessing import (Event, Pool, cpu_count)
+import bisect
 import json
+import os
+import queue
+import re
+import time
+from def_sections import (index_sections, section_span, section_slice, text_slice, split_records,
+                          record_spans, split_wires, record_end, iter_section_records, iter_statements,
+                          SECTION_KEYWORDS)
+from def_stats import SectionStats, ParseStats, sent_stats, received_stats
+from def_compress import compression, open_def, map_def, decompressed_copy
 
 # GLOBALS for this class
 EOL = pp.LineEnd().suppress()
 linebreak = pp.Suppress(";" + pp.LineEnd())
+identifier_chars = pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~'
+identifier = pp.Word(identifier_chars)  # CONFLICT with '();'
 number = pp.pyparsing_common.number
 word = pp.Word(pp.alphas)
 LPAR = pp.Suppress('(')
@@ -20,6 +32,176 @@ ORIENT = (pp.Keyword('N')
         | pp.Keyword('FW'))
 pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
 
+
+# Parse action of a named skip_clause: [name, start, end] of the skipped text
+class SkipSpan:
+    #
+    def __init__(self, name):
+        self.name = name
+
+    #
+    def __call__(self, string, loc, tokens):
+        return [[self.name, loc, loc + len(tokens[0])]]
+
+
+# Step over a '+ KEYWORD ...' clause with a single regex match, without
+# building any token. The clause ends at ';' or at the next ' + ', or, when
+# stop is given, only at the next ' + STOP' (stop=() for ';' only).
+# With a name, the clause is recorded as [name, start, end] in the 'skipped'
+# list of the record, to be parsed later (see DefParser.parse_skipped).
+def skip_clause(*keywords, stop=None, name=None):
+    if stop is None:
+        body = r'(?:(?!\s\+\s)[^;])*'
+    elif stop:
+        body = r'(?:(?!\s\+\s+(?:' + '|'.join(stop) + r')(?=\s))[^;])*'
+    else:
+        body = r'[^;]*'
+    skip = pp.Regex(r'\+\s+(?:' + '|'.join(keywords) + r')(?=\s)' + body)
+    if name is None:
+        return skip.suppress()
+    return skip.setParseAction(SkipSpan(name))('skipped*')
+
+
+# Add base to the offsets of the 'skipped' clauses of records, which are
+# relative to the text that was parsed. With binary, text was decoded from a
+# bytes-like file and base is a byte offset (see def_sections): the offsets
+# in text are converted to byte offsets too, so that they are all in one unit
+def shift_skipped(records, base, text='', binary=False):
+    if binary and not text.isascii():
+        for record in records:
+            for skipped in record.get('skipped', ()):
+                skipped[1:] = [len(text[:i].encode()) for i in skipped[1:]]
+    if base:
+        for record in records:
+            for skipped in record.get('skipped', ()):
+                skipped[1] += base
+                skipped[2] += base
+    return records
+
+
+# Fast path for '- inst cell + PLACED|FIXED ( x y ) ORIENT [+ WEIGHT n] ;' components.
+# Anything else is left to the subcomponent grammar (see parse_components_chunk)
+_ws = r'[ \t\r\n]+'
+_id = '([' + re.escape(''.join(sorted(set(identifier_chars)))) + ']+)'
+_int = r'(-?[0-9]+)'
+component_re = re.compile(r'[ \t\r\n]*-' + _ws + _id + _ws + _id
+                          + _ws + r'\+' + _ws + '(PLACED|FIXED)'
+                          + _ws + r'\(' + _ws + _int + _ws + _int + _ws + r'\)'
+                          + _ws + '(FN|FS|FE|FW|N|S|E|W)'
+                          + '(?:' + _ws + r'\+' + _ws + 'WEIGHT' + _ws + _int + ')?'
+                          + r'[ \t\r\n]*;[ \t\r]*(?:\n|\Z)')
+
+# Record grammar (parse_<record>) and results name of each block section
+RECORDS = {'components': ('subcomponent', 'subcomponents'),
+           'pins': ('pin', 'pin'),
+           'nets': ('net', 'net'),
+           'specialnets': ('specialnet', 'specialnets'),
+          }
+# Block sections whose grammar needs at least one record (OneOrMore): an
+# empty section gives no results at all, the others only their header
+ONE_OR_MORE = ('components', 'pins')
+
+# Parser and .DEF file used by the pool workers (see _init_worker)
+_worker_parser = None
+_worker_string = None
+_worker_index = None
+# (path, mtime) of the file mapped in _worker_string by a parse_batch worker
+_worker_path = None
+
+
+# Pool initializer: the parser and the file are inherited by the worker,
+# so the tasks only carry section names and offsets, never the file itself
+def _init_worker(parser, def_string=None, section_index=None):
+    global _worker_parser, _worker_string, _worker_index
+    _worker_parser = parser
+    _worker_parser.section_stats = []  # not the ones of the parent
+    _worker_string = def_string
+    _worker_index = section_index
+
+
+# Return the results of the sections and their SectionStats
+def _parse_sections(sections):
+    results = _worker_parser.parse_sections(sections, _worker_string, _worker_index)
+    if _worker_parser.shared_results:
+        from def_shm import share
+        results = share(results)
+    return results, sent_stats(_worker_parser.pop_stats())
+
+
+# Return the results of a task of DefParser.plan_chunks and its SectionStats:
+# the records of the chunk, or the NEW wires for a 'wires' task
+def _parse_chunk(section, kind, spans):
+    start = spans[0][0]
+    stats = SectionStats(section, chunk=start)
+    t0 = time.perf_counter()
+    chunk = ''.join(text_slice(_worker_string, a, b) for a, b in spans)
+    result = _worker_parser.parse_chunk(section, kind, chunk, start, not isinstance(_worker_string, str))
+    stats.scan_s = time.perf_counter() - t0
+    stats.done(len(result))
+    if _worker_parser.shared_results:
+        from def_shm import share
+        result = share(result)
+    return result, sent_stats([stats])
+
+
+# Return the NDJSON text of the records of a (section, span) chunk of a block section
+def _encode_records_chunk(task):
+    from def_writer import encode_records
+    section, (start, end) = task
+    chunk = text_slice(_worker_string, start, end)
+    binary = not isinstance(_worker_string, str)
+    return encode_records(_worker_parser.parse_records_chunk(section, chunk, start, binary))
+
+
+# Map the .DEF file at path in a parse_batch worker, unless it is already
+# the current one and it did not change since (long-lived pools, def_daemon)
+def _map_file(path, section_index):
+    global _worker_string, _worker_index, _worker_path
+    key = (path, os.stat(path).st_mtime_ns)
+    if key != _worker_path:
+        if _worker_path is not None:
+            _worker_string.close()
+        _worker_string = map_def(path)
+        _worker_path = key
+    _worker_index = section_index
+
+
+#
+def _parse_file_sections(path, section_index, sections):
+    _map_file(path, section_index)
+    return _parse_sections(sections)
+
+
+#
+def _parse_file_chunk(path, section, kind, spans):
+    _map_file(path, None)
+    return _parse_chunk(section, kind, spans)
+
+
+# Number of records in the results of a section
+def count_records(section, results):
+    result = results.get(section, results.get(section.upper()))
+    if section not in RECORDS:
+        return int(result is not None)
+    if not result:
+        return 0
+    return len(result.get(RECORDS[section][1], result.get('table', ())))
+
+
+# Grammars built by DefParser.get_grammar, once per process and configuration
+GRAMMARS = {}
+# Full grammar of each clause that can be skipped, filled by the record grammars
+CLAUSES = {}
+# Record grammar defining each clause of CLAUSES
+SKIPPED_CLAUSES = {'WIRING': 'net',
+                   'VPIN': 'net',
+                   'SUBNET': 'net',
+                   'PLACEMENT': 'pin',
+                   'specialWiring': 'specialnet',
+                  }
+# Bump when a grammar change alters the parse results (invalidates the parse cache)
+GRAMMAR_VERSION = 2
+
 class DefParser:
     #
     def __init__(self):
@@ -28,7 +210,51 @@ class DefParser:
         self.ignore_specialnets = True
         self.ignore_nets = True
         self.ignore_nets_route = False
-        # Each list is a new process. Careful with dependencies.
+        # Skip these clauses at scan speed. Each one is recorded in the
+        # 'skipped' list of its record as [clause, start, end] file offsets,
+        # and can be parsed later with parse_skipped
+        self.ignore_nets_vpin = False
+        self.ignore_nets_subnet = False
+        self.ignore_pins_geometry = False
+        self.ignore_specialnets_route = False
+        # Projection: the record fields to return per section, e.g.
+        # {'components': ['comp_name', 'cell', 'placement_x', 'placement_y']}.
+        # The clauses without a requested field are skipped (COMPONENTS and NETS)
+        self.fields = None
+        # Split the COMPONENTS records in chunks parsed by a pool of n_workers
+        self.parallel_components = False
+        # Same for the NETS records
+        self.parallel_nets = False
+        # Same for the SPECIALNETS records, a large special net is also split at its NEW wires
+        self.parallel_specialnets = False
+        self.n_workers = cpu_count()
+        # Parse the plain placement COMPONENTS records with component_re
+        self.components_fast_path = True
+        # Map the .DEF files in memory instead of reading them in a str
+        self.use_mmap = False
+        # Return COMPONENTS as {'numComps': n, 'table': def_table.ComponentTable}
+        self.components_table = False
+        # Return NETS as {'numNets': n, 'table': def_table.NetTable}
+        self.nets_table = False
+        # The workers send the tables back in shared memory (def_shm), the
+        # parent maps their arrays instead of unpickling them
+        self.shared_results = False
+        # Directory of the on-disk parse cache (def_cache.ParseCache), None to disable
+        self.cache_dir = None
+        self.cache_max_bytes = 10 * 2**30
+        # Bounded-memory mode: parse_file reads the file one line at a time and
+        # keeps about memory_budget bytes of text, parse trees and results
+        # (see parse_file_bounded). Temporary files go to spill_dir (tempfile's default when None)
+        self.memory_budget = None
+        self.spill_dir = None
+        # Decompressed copies of the compressed files being parsed by parse_batch
+        self.decompressed = {}
+        # Measures of the last parsed file (def_stats.ParseStats), also appended
+        # as JSON lines to stats_file when it is set
+        self.stats = None
+        self.stats_file = None
+        self.section_stats = []
+        # Each list is a task of the pool. Careful with dependencies.
         # 'dbuPerMicron' must be executed bofore the other, but can be after 'design'
         self.sections_grp = [['design', 'dbuPerMicron', 'diearea'],
                              ['components'],
@@ -51,52 +277,517 @@ class DefParser:
 
     #
     def run(self):
-        for curr_def in self.def_files:
-            ifile = open(curr_def,'r')
+        for curr_def, results in self.parse_batch(self.def_files):
+            self.handle_sections(results)
+        # exit()
+
+    # Return the parse cache (def_cache.ParseCache), None when it is disabled
+    def open_cache(self):
+        if self.cache_dir is None:
+            return None
+        from def_cache import ParseCache
+        return ParseCache(self.cache_dir, self.cache_max_bytes)
+
+    # Parse the .DEF files at paths on a single pool and yield (path, results)
+    # as each file is done, not in the order of paths. The largest files are
+    # scheduled first; each group of self.sections_grp (and each chunk of the
+    # sections split with parallel_<section>) is a task, so the sections of the
+    # different files are spread over the pool.
+    def parse_batch(self, paths):
+        paths = list(paths)
+        cache = self.open_cache()
+        if self.memory_budget is not None:
+            for path in paths:  # one file at a time, within the budget
+                yield path, self.parse_file_cached(path, cache)
+            return
+
+        self.events[0].set()  # the results are merged here, in order, so the tasks can run in any order
+        self.build_grammars()
+        self.pop_stats()
+        done = queue.Queue()
+        n_done = 0
+        n_processes = max(len(self.sections_grp), self.n_workers)
+        with self.make_pool(n_processes) as pool:
+            for path in sorted(paths, key=os.path.getsize, reverse=True):
+                self.submit_file(pool, path, done, cache)
+                while not done.empty():  # the files already done, while the others are submitted
+                    n_done += 1
+                    yield self.finish_file(done.get(), cache)
+
+            for _ in range(len(paths) - n_done):
+                yield self.finish_file(done.get(), cache)
+
+    # parse_file through the parse cache, when there is one
+    def parse_file_cached(self, path, cache):
+        if cache is None:
+            return self.parse_file(path)
+        key = cache.key(path, self.cache_config())
+        results = cache.load(key)
+        if results is None:
+            results = self.parse_file(path)
+            cache.store(key, results)
+        return results
+
+    # Submit the tasks of the .DEF file at path to the pool of parse_batch. The
+    # file is put in done when its last task is done (or from the parse cache).
+    def submit_file(self, pool, path, done, cache=None):
+        key = None
+        if cache is not None:
+            key = cache.key(path, self.cache_config())
+            results = cache.load(key)
+            if results is not None:
+                done.put((path, key, {'results': results}))
+                return
+
+        # The workers map the file themselves, only the offsets are sent. A
+        # compressed file is decompressed once, to a copy they map instead
+        map_path = path
+        if compression(path) is not None:
+            map_path = self.decompressed[path] = decompressed_copy(path)
+        def_string = map_def(map_path)
+        section_index = index_sections(def_string)
+        parallel = self.parallel_sections()
+        tasks = []
+        for sections in self.sections_grp:
+            sections = [x for x in sections if x not in parallel]
+            tasks.append((None, _parse_file_sections, (map_path, section_index, sections)))
+
+        # Chunks of the parallel sections: {section: (header, plan, [chunk results])}
+        batch = {'results': {}, 'stats': [], 'chunks': {}}
+        for section in parallel:
+            if SECTION_KEYWORDS[section] not in section_index:
+                continue
+            start, end = section_span(def_string, section_index, section)
+            body_start, plan = self.plan_chunks(section, def_string, start, end)
+            batch['chunks'][section] = (text_slice(def_string, start, body_start), plan, [None] * len(plan))
+            tasks += [((section, i), _parse_file_chunk, (map_path, section, kind, spans))
+                      for i, (kind, spans) in enumerate(plan)]
+        def_string.close()
+        batch['pending'] = len(tasks)
+
+        # Run by the result handler thread of the pool, one at a time
+        def task_done(chunk, output):
+            received_stats(output)
+            result, stats = output
+            result = self.attach(result)
+            if chunk is None:
+                batch['results'].update(result)
+            else:
+                section, i = chunk
+                batch['chunks'][section][2][i] = result
+            batch['stats'].extend(stats)
+            task_finished()
+
+        # The file is put in done once, with the first error of its tasks if any
+        def task_failed(exc):
+            batch.setdefault('error', exc)
+            task_finished()
+
+        #
+        def task_finished():
+            batch['pending'] -= 1
+            if batch['pending'] == 0:
+                done.put((path, key, batch))
+
+        for chunk, func, args in tasks:
+            pool.apply_async(func, args, callback=lambda output, chunk=chunk: task_done(chunk, output),
+                             error_callback=task_failed)
+
+    # Return (path, results) of a file of parse_batch taken from done
+    def finish_file(self, item, cache=None):
+        path, key, batch = item
+        if path in self.decompressed:
+            os.unlink(self.decompressed.pop(path))
+        if 'error' in batch:
+            raise batch['error']
+
+        results = batch['results']
+        if 'stats' not in batch:
+            return path, results  # from the parse cache
+
+        for section, (header_string, plan, chunks) in batch['chunks'].items():
+            results.update(self.merge_records(section, header_string, plan, chunks))
+        if cache is not None:
+            cache.store(key, results)
+        self.stats = ParseStats(path, batch['stats'])
+        if self.stats_file is not None:
+            self.stats.write_jsonl(self.stats_file)
+        return path, results
+
+    # Read and parse the .DEF file at path (compressed or not, def_compress),
+    # return the results of every section
+    def parse_file(self, path):
+        if self.memory_budget is not None:
+            results = self.parse_file_bounded(path)
+        elif self.use_mmap:
+            # Only the parsed slices are decoded and the forked workers
+            # share the mapped pages instead of a copy of the file
+            file_string = map_def(path)
+            results = self.parser_def(file_string)
+            file_string.close()
+        else:
+            ifile = open_def(path)
             file_string = ifile.read()
             ifile.close()
-            self.parser_def(file_string)
-        # exit()
+            results = self.parser_def(file_string)
+
+        self.stats = ParseStats(path, self.pop_stats())
+        if self.stats_file is not None:
+            self.stats.write_jsonl(self.stats_file)
+        return results
+
+    # Parse the .DEF file at path within about memory_budget bytes. The lines
+    # are read one at a time and the records of each block section are parsed
+    # by windows of budget // WINDOW_FRACTION characters. The window results
+    # are kept pickled, and spilled to temporary files when they fill half the
+    # budget (def_spill). The sections are merged at the end, so the merged
+    # results must fit: with components_table and nets_table they are a
+    # fraction of the size of the records.
+    def parse_file_bounded(self, path):
+        from def_spill import SpillStore, WINDOW_FRACTION
+        self.events[0].set()
+        sections = [section for group in self.sections_grp for section in group]
+        keywords = {SECTION_KEYWORDS[section]: section for section in sections}
+        window_size = max(1, self.memory_budget // WINDOW_FRACTION)
+        statements = []
+        headers = {}
+        windows = {}  # section -> (offset, [records]), records not parsed yet
+
+        with SpillStore(self.memory_budget // 2, self.spill_dir) as store:
+            with open_def(path, newline='') as ifile:  # keep the line ends, for the offsets
+                for keyword, kind, offset, text in iter_statements(ifile, keywords):
+                    section = keywords[keyword]
+                    if kind == 'statement':
+                        statements.append(text)
+                    elif kind == 'header':
+                        headers[section] = text
+                    elif (section == 'specialnets' and not self.ignore_specialnets_route
+                          and len(text) > window_size):
+                        self.parse_window(store, section, windows.pop(section, None))
+                        self.parse_large_record(store, section, offset, text, window_size)
+                    else:
+                        window = windows.setdefault(section, (offset, []))
+                        window[1].append(text)
+                        if offset + len(text) - window[0] >= window_size:
+                            self.parse_window(store, section, windows.pop(section))
+                for section in list(windows):
+                    self.parse_window(store, section, windows.pop(section))
+
+            def_string = ''.join(statements)
+            results = self.parse_sections([s for s in sections if s not in RECORDS],
+                                          def_string, index_sections(def_string))
+            for section, header_string in headers.items():
+                results.update(self.merge_records(section, header_string, store.plan(section),
+                                                  list(store.load(section))))
+        return results
+
+    # Parse a window of records (offset, [records]) of a bounded-memory parse into store
+    def parse_window(self, store, section, window):
+        if window is None:
+            return
+        offset, records = window
+        stats = SectionStats(section, chunk=offset)
+        t0 = time.perf_counter()
+        result = self.parse_chunk(section, 'records', ''.join(records), offset)
+        stats.scan_s = time.perf_counter() - t0
+        stats.done(len(result))
+        self.section_stats.append(stats)
+        store.add(section, 'records', result)
+
+    # Parse a special net larger than a window of a bounded-memory parse in
+    # pieces, split at its NEW wires as in parallel_specialnets
+    def parse_large_record(self, store, section, offset, text, window_size):
+        tasks = self.split_specialnet(text, 0, len(text), window_size)
+        if tasks is None:
+            tasks = [('records', [(0, len(text))])]
+        for kind, spans in tasks:
+            stats = SectionStats(section, chunk=offset + spans[0][0])
+            t0 = time.perf_counter()
+            chunk = ''.join(text[start:end] for start, end in spans)
+            result = self.parse_chunk(section, kind, chunk, offset + spans[0][0])
+            stats.scan_s = time.perf_counter() - t0
+            stats.done(len(result))
+            self.section_stats.append(stats)
+            store.add(section, kind, result)
+
+    # Return and forget the SectionStats collected so far by this process
+    def pop_stats(self):
+        stats, self.section_stats = self.section_stats, []
+        return stats
+
+    # Options that change the parse results, part of the parse cache key
+    def cache_config(self):
+        return {'grammar_version': GRAMMAR_VERSION,
+                'sections_grp': self.sections_grp,
+                'ignore_pins': self.ignore_pins,
+                'ignore_specialnets': self.ignore_specialnets,
+                'ignore_nets': self.ignore_nets,
+                'ignore_nets_route': self.ignore_nets_route,
+                'ignore_nets_vpin': self.ignore_nets_vpin,
+                'ignore_nets_subnet': self.ignore_nets_subnet,
+                'ignore_pins_geometry': self.ignore_pins_geometry,
+                'ignore_specialnets_route': self.ignore_specialnets_route,
+                'fields': self.fields,
+                'components_table': self.components_table,
+                'nets_table': self.nets_table,
+               }
 
     #
-    def parser_def(self, file_string):
-        manager = Manager()
-        shared_dict = manager.dict()
-        # is_nets_section, is_not_nets_section  = self.divide_def_file(self.def_file_design[0])
-        jobs = []
+    def handle_sections(self, results):
         for sections in self.sections_grp:
-            p = Process(target=self.parse_sections, args=(sections, file_string, shared_dict))
-            jobs.append(p)
-            p.start()
+            for section in sections:
+                getattr(self, 'handle_' + section)(results)
+
+    # Yield the records of a block section of the .DEF file at path as soon
+    # as they are parsed, without reading the whole file in memory
+    def iter_records(self, path, section):
+        keyword = SECTION_KEYWORDS[section]
+        with open_def(path, newline='') as ifile:  # keep the line ends, for the offsets
+            for offset, record in iter_section_records(ifile, keyword):
+                for item in self.parse_records_chunk(section, record, offset):
+                    yield item
+
+    # Write the records of a block section of the .DEF file at path to the
+    # text file ofile as NDJSON (def_writer), as they are parsed. With
+    # n_encoders, a pool of that many workers parses and encodes chunks of
+    # the section, and their text is written in file order.
+    # Returns the number of records written.
+    def write_ndjson(self, path, section, ofile, n_encoders=0):
+        from def_writer import NDJSONWriter, BUFFER_SIZE
+        with NDJSONWriter(ofile) as writer:
+            if not n_encoders:
+                for record in self.iter_records(path, section):
+                    writer.write(record)
+                return writer.records
+
+            def_string = map_def(path)
+            section_index = index_sections(def_string)
+            if SECTION_KEYWORDS[section] in section_index:
+                start, end = section_index[SECTION_KEYWORDS[section]]
+                n_chunks = max(n_encoders * 4, (end - start) // BUFFER_SIZE)
+                spans = split_records(def_string, n_chunks, start, end)[1]
+                with self.make_pool(n_encoders, def_string, section_index) as pool:
+                    for text in pool.imap(_encode_records_chunk, [(section, span) for span in spans]):
+                        writer.write_encoded(text)
+            def_string.close()
+        return writer.records
 
-        # Wait for the workers to finish
-        for job in jobs:
-            job.join()
+    #
+    def iter_components(self, path):
+        return self.iter_records(path, 'components')
 
-        for sections in self.sections_grp:
-            for section in sections:
-                getattr(self, 'handle_' + section)(shared_dict)
+    #
+    def iter_pins(self, path):
+        return self.iter_records(path, 'pins')
+
+    #
+    def iter_nets(self, path):
+        return self.iter_records(path, 'nets')
+
+    #
+    def iter_specialnets(self, path):
+        return self.iter_records(path, 'specialnets')
 
-    # Spawn the processes from each group of self.sections_grp
-    def parse_sections(self, sections, def_string, shared_dict):
+    #
+    def parser_def(self, file_string):
+        results = {}
+        # Offsets of every section, so each grammar only scans its own slice
+        section_index = index_sections(file_string)
+        # Built here so the forked workers inherit them
+        self.build_grammars()
+        # is_nets_section, is_not_nets_section  = self.divide_def_file(self.def_file_design[0])
+        parallel = self.parallel_sections()
+        n_processes = len(self.sections_grp)
+        if parallel:
+            n_processes = max(n_processes, self.n_workers)
+
+        # The workers return their results directly, no Manager proxy in between
+        with self.make_pool(n_processes, file_string, section_index) as pool:
+            jobs = []
+            for sections in self.sections_grp:
+                sections = [x for x in sections if x not in parallel]
+                jobs.append(pool.apply_async(_parse_sections, (sections,), callback=received_stats))
+
+            for section in parallel:
+                if self.has_section(section_index, section):  # else left out, see parse_sections
+                    results.update(self.parse_records_parallel(section, file_string, section_index, pool))
+
+            for job in jobs:
+                job_results, stats = job.get()
+                results.update(self.attach(job_results))
+                self.section_stats.extend(stats)
+
+        return results
+
+    # Parse each section of a group of self.sections_grp and return the results
+    def parse_sections(self, sections, def_string, section_index=None):
+        if section_index is None:
+            section_index = index_sections(def_string)  # the fast path and the chunks need the real slices
+        results = {}
         for section in sections:
-            to_parse = getattr(self, 'parse_' + section)
-            for t, s, e in to_parse().scanString(def_string):
-                shared_dict.update(t.asDict())
-                break
+            if section == 'design':
+                self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
+            elif section in ('dbuPerMicron', 'diearea', 'components'):
+                self.events[0].wait()  # Wait for event[0] to finish
+
+            stats = SectionStats(section)
+            if section in RECORDS and not self.has_section(section_index, section):
+                # Left out, as scanString does. The fast path and the chunks
+                # would take the whole file for the section
+                stats.done(0)
+                self.section_stats.append(stats)
+                continue
+
+            if self.is_parallel(section):
+                results.update(self.parse_records_parallel(section, def_string, section_index))
+                continue
+
+            if section == 'components' and self.components_fast_path:
+                t0 = time.perf_counter()
+                results.update(self.parse_components_fast(section_slice(def_string, section_index, section)))
+                stats.scan_s = time.perf_counter() - t0
+            else:
+                t0 = time.perf_counter()
+                to_parse = self.get_grammar(section)
+                t1 = time.perf_counter()
+                section_string = section_slice(def_string, section_index, section)
+                for t, s, e in to_parse.scanString(section_string):
+                    t2 = time.perf_counter()
+                    results.update(t.asDict())
+                    if section in RECORDS and SECTION_KEYWORDS[section] in results:
+                        result = results[SECTION_KEYWORDS[section]]
+                        name = RECORDS[section][1]
+                        start = section_span(def_string, section_index, section)[0]
+                        if name in result:  # not there for an empty NETS/SPECIALNETS
+                            binary = not isinstance(def_string, str)
+                            records = shift_skipped(result[name], start, section_string, binary)
+                            result[name] = self.project_records(section, records)
+                        table = self.table_class(section)
+                        if table is not None:
+                            result['table'] = table.from_records(result.pop(name, []))
+                    stats.asdict_s = time.perf_counter() - t2
+                    break
+                else:
+                    t2 = time.perf_counter()
+                stats.grammar_s = t1 - t0
+                stats.scan_s = t2 - t1
+
+            stats.done(count_records(section, results))
+            self.section_stats.append(stats)
+
+        return results
+
+    # Whether the file of section_index has section. Without an index the
+    # whole file is scanned, so the section is assumed to be there
+    def has_section(self, section_index, section):
+        return section_index is None or SECTION_KEYWORDS[section] in section_index
+
+    # Return the grammar of parse_<section>. It is built once per process and
+    # configuration, then shared by every file and by the forked workers
+    def get_grammar(self, section):
+        key = (section,) + self.grammar_options()
+        if key not in GRAMMARS:
+            GRAMMARS[key] = getattr(self, 'parse_' + section)()
+        return GRAMMARS[key]
+
+    # Options that change the grammars, part of the GRAMMARS key
+    def grammar_options(self):
+        fields = None
+        if self.fields:
+            fields = tuple(sorted((section, tuple(names)) for section, names in self.fields.items()))
+        return (self.ignore_nets_route, self.ignore_nets_vpin, self.ignore_nets_subnet,
+                self.ignore_pins_geometry, self.ignore_specialnets_route, fields, self.components_table)
+
+    # Parse a clause recorded in the 'skipped' list of a record ([clause, start, end])
+    # from the .DEF file it was skipped in, as a str or bytes-like (see def_sections)
+    def parse_skipped(self, def_string, skipped):
+        name, start, end = skipped
+        if name not in CLAUSES:
+            getattr(self, 'parse_' + SKIPPED_CLAUSES[name])()
+        return CLAUSES[name].parseString(text_slice(def_string, start, end), parseAll=True).asDict()
+
+    # Return the projected fields of section, None to return every field.
+    # A ComponentTable has its own columns, so it ignores the projection.
+    def projection(self, section):
+        if not self.fields or (section == 'components' and self.components_table):
+            return None
+        return self.fields.get(section)
+
+    # Return clause if one of its results names is projected, else skip
+    def project(self, section, clause, skip, *names):
+        fields = self.projection(section)
+        if fields is None or any(name in fields for name in names):
+            return clause
+        return skip
+
+    # Keep only the projected fields of the records of section
+    def project_records(self, section, records):
+        fields = self.projection(section)
+        if fields is None:
+            return records
+        return [{name: rec[name] for name in fields if name in rec} for rec in records]
+
+    # def_table class of the records of section when it is returned as a table, else None
+    def table_class(self, section):
+        if section == 'components' and self.components_table:
+            from def_table import ComponentTable
+            return ComponentTable
+        if section == 'nets' and self.nets_table:
+            from def_table import NetTable
+            return NetTable
+        return None
+
+    # Pool of n_processes forked with this parser and the file (see _init_worker)
+    def make_pool(self, n_processes, def_string=None, section_index=None):
+        if self.shared_results:
+            # A single resource tracker for the parent and the workers, so the
+            # blocks created by a worker are released by the parent
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        return Pool(n_processes, initializer=_init_worker, initargs=(self, def_string, section_index))
+
+    # Results of a worker with their shared memory tables attached (see shared_results)
+    def attach(self, results):
+        if not self.shared_results:
+            return results
+        from def_shm import attach
+        return attach(results)
+
+    # Whether the records of section are split in chunks across a pool
+    def is_parallel(self, section):
+        return ((section == 'components' and self.parallel_components)
+                or (section == 'nets' and self.parallel_nets)
+                or (section == 'specialnets' and self.parallel_specialnets))
+
+    # Sections of self.sections_grp split in chunks across the pool
+    def parallel_sections(self):
+        return [section for sections in self.sections_grp for section in sections
+                if self.is_parallel(section)]
+
+    # Build the grammars of self.sections_grp before the workers are forked
+    def build_grammars(self):
+        names = [section for sections in self.sections_grp for section in sections]
+        if self.components_fast_path:
+            names += ['subcomponent', 'components_header']
+        for section in self.parallel_sections():
+            names += [RECORDS[section][0], section + '_header']
+
+        for name in names:
+            stats = SectionStats(name)
+            t0 = time.perf_counter()
+            self.get_grammar(name)
+            stats.grammar_s = time.perf_counter() - t0
+            stats.done(0)
+            self.section_stats.append(stats)
 
     # Parse the DESIGN section of a .DEF file
     def parse_design(self):
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         design_id  = pp.Keyword('DESIGN')
         design     = design_id + identifier('DESIGN') + linebreak
-        self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
         return design
 
     # Parse the UNITS DISTANCE MICRONS section of a .DEF file
     def parse_dbuPerMicron(self):
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         dbuPerMicron_id  = pp.Keyword('UNITS DISTANCE MICRONS')
         dbuPerMicron     = dbuPerMicron_id + number('dbuPerMicron') + linebreak
 
@@ -104,8 +795,6 @@ class DefParser:
 
     # Parse the DIEAREA section of a .DEF file
     def parse_diearea(self):
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         diearea_id  = pp.Keyword('DIEAREA')
         diearea     = pp.Group(pp.Suppress(diearea_id)
                                + pp.OneOrMore(pt)
@@ -116,10 +805,21 @@ class DefParser:
 
     # Parse the COMPONENTS section of a .DEF file
     def parse_components(self):
-        self.events[0].wait()  # Wait for event[0] to finish
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         components_id = pp.Keyword('COMPONENTS')
         end_components_id = pp.Keyword("END COMPONENTS").suppress()
+        subcomponent = self.get_grammar('subcomponent')
+
+        components = pp.Group(pp.Suppress(components_id)
+                                          + number('numComps')
+                                          + linebreak
+                                          + pp.OneOrMore(subcomponent)
+                                          + pp.Suppress(end_components_id)
+                             ).setResultsName('COMPONENTS')
+
+        return components
+
+    # Parse a single '- compName modelName ... ;' record of the COMPONENTS section
+    def parse_subcomponent(self):
         begin_comp = pp.Suppress(pp.Keyword('-'))
         ws_comp = pp.Suppress(pp.Keyword('+'))  # parameter division in components
 
@@ -198,6 +898,19 @@ class DefParser:
                     + identifier('propVal')
                    ).setResultsName('PROPERTY')
 
+        # Projection (self.fields): the clauses without a requested field are skipped
+        EEQMASTER = self.project('components', EEQMASTER, skip_clause('EEQMASTER'), 'EEQMASTER')
+        SOURCE = self.project('components', SOURCE, skip_clause('SOURCE'), 'SOURCE', 'source_type')
+        PLACEMENT = self.project('components', PLACEMENT, skip_clause('FIXED', 'COVER', 'PLACED', 'UNPLACED'),
+                                 'PLACEMENT', 'placement_x', 'placement_y', 'orientation')
+        MASKSHIFT = self.project('components', MASKSHIFT, skip_clause('MASKSHIFT'), 'MASKSHIFT', 'shiftLayerMasks')
+        HALO = self.project('components', HALO, skip_clause('HALO'), 'HALO', 'haloL', 'haloB', 'haloR', 'haloT')
+        ROUTEHALO = self.project('components', ROUTEHALO, skip_clause('ROUTEHALO'),
+                                 'ROUTEHALO', 'rhaloDist', 'rhaloMinLayer', 'rhaloMaxLayer')
+        WEIGHT = self.project('components', WEIGHT, skip_clause('WEIGHT'), 'WEIGHT', 'weight')
+        REGION = self.project('components', REGION, skip_clause('REGION'), 'REGION', 'region')
+        PROPERTY = self.project('components', PROPERTY, skip_clause('PROPERTY'), 'PROPERTY', 'propName', 'propVal')
+
         subcomponent = pp.Group(begin_comp
                                 + compName
                                 + (pp.Optional(EEQMASTER)
@@ -212,20 +925,259 @@ class DefParser:
                                 + linebreak
                                ).setResultsName('subcomponents', listAllMatches=True)
 
-        components = pp.Group(pp.Suppress(components_id)
-                                          + number('numComps')
-                                          + linebreak
-                                          + pp.OneOrMore(subcomponent)
-                                          + pp.Suppress(end_components_id)
-                             ).setResultsName('COMPONENTS')
+        return subcomponent
 
-        return components
+    # Parse a block section (see RECORDS) splitting its records across a pool of
+    # workers. The pool must have been initialized with the same def_string (see _init_worker)
+    def parse_records_parallel(self, section, def_string, section_index, pool=None):
+        if pool is None:
+            with self.make_pool(self.n_workers, def_string, section_index) as pool:
+                return self.parse_records_parallel(section, def_string, section_index, pool)
+
+        start, end = section_span(def_string, section_index, section)
+        body_start, plan = self.plan_chunks(section, def_string, start, end)
+        jobs = [pool.apply_async(_parse_chunk, (section, kind, spans), callback=received_stats)
+                for kind, spans in plan]
+        results = []
+        for job in jobs:
+            result, stats = job.get()
+            results.append(self.attach(result))
+            self.section_stats.extend(stats)
+
+        return self.merge_records(section, text_slice(def_string, start, body_start), plan, results)
+
+    # Split the records of the block section held in def_string[start:end] in
+    # tasks for the pool. Returns (body_start, plan), plan being a list of
+    # (kind, spans) in file order, the text of a task being the concatenation
+    # of its spans:
+    #   'records'  a chunk of whole records
+    #   'ends'     a special net without its middle NEW wires (see split_specialnet)
+    #   'wires'    a run of those NEW wires, following the 'ends' task of its net
+    def plan_chunks(self, section, def_string, start, end):
+        body_start, spans = split_records(def_string, self.n_workers * 4, start, end)
+        if section != 'specialnets' or self.ignore_specialnets_route or not spans:
+            return body_start, [('records', [span]) for span in spans]
+
+        # A few special nets usually hold most of the section, so the
+        # records larger than a chunk are split at their NEW wires
+        step = max(1, (spans[-1][1] - body_start) // (self.n_workers * 4))
+        plan = []
+        pos = body_start  # start of the records not planned yet
+        for rec_start, rec_end in record_spans(def_string, start, end):
+            if rec_end - rec_start > step:
+                tasks = self.split_specialnet(def_string, rec_start, rec_end, step)
+                if tasks is not None:
+                    if pos < rec_start:
+                        plan.append(('records', [(pos, rec_start)]))
+                    plan += tasks
+                    pos = rec_end
+                    continue
+            if rec_end - pos >= step:
+                plan.append(('records', [(pos, rec_end)]))
+                pos = rec_end
+        if pos < spans[-1][1]:
+            plan.append(('records', [(pos, spans[-1][1])]))
+
+        return body_start, plan
+
+    # Split the special net def_string[start:end] at its NEW wires: an 'ends'
+    # task, the net without the wires between the first and the last NEW, and
+    # 'wires' tasks of about step characters with those wires. Returns None
+    # when the net can not be split (see def_sections.split_wires).
+    # The cuts are only made before a NEW, where the wire starts again from
+    # its own first point, so a '*' coordinate never refers to another task.
+    def split_specialnet(self, def_string, start, end, step):
+        news = split_wires(def_string, start, end)
+        if news is None:
+            return None
+
+        tasks = [('ends', [(start, news[0]), (news[-1], end)])]
+        i = 0
+        while i < len(news) - 1:
+            j = bisect.bisect_left(news, news[i] + step, i + 1, len(news) - 1)
+            j = max(j, i + 1)
+            tasks.append(('wires', [(news[i], news[j])]))
+            i = j
+
+        return tasks
+
+    # Return the results of a block section from its 'KEYWORD n ;' header and
+    # the results of the tasks of plan (see plan_chunks), in file order
+    def merge_records(self, section, header_string, plan, results):
+        if not plan and section in ONE_OR_MORE:
+            return {}  # as the section grammar, see ONE_OR_MORE
+        header = self.get_grammar(section + '_header')
+        merged = header.parseString(header_string).asDict()
+        table = self.table_class(section)
+        if table is not None:
+            merged['table'] = table.concatenate(results)
+            return {SECTION_KEYWORDS[section]: merged}
+
+        records = []
+        wires = None  # NEW wires of the last 'ends' record
+        for (kind, spans), result in zip(plan, results):
+            if kind == 'wires':
+                wires.extend(result)
+                continue
+            if wires:
+                self.stitch_wires(records[-1], wires)
+            wires = [] if kind == 'ends' else None
+            records.extend(result)
+        if wires:
+            self.stitch_wires(records[-1], wires)
+
+        if records:
+            merged[RECORDS[section][1]] = records
+        return {SECTION_KEYWORDS[section]: merged}
+
+    # Put the NEW wires parsed apart back in front of the last NEW wire of a
+    # special net parsed without them, as in the parse of the whole net
+    def stitch_wires(self, record, wires):
+        wiring = record.get('specialWiring')
+        if wiring is not None:  # not projected out
+            wiring['NEW'][-1][:0] = wires
+
+    # Parse a run of NEW wires of a special net, see split_specialnet
+    def parse_wires_chunk(self, chunk):
+        if 'NEW' not in CLAUSES:
+            self.get_grammar('specialnet')
+        return CLAUSES['NEW'].parseString(chunk, parseAll=True).asDict().get('NEW', [])
+
+    # Parse the text of a task of plan_chunks: the records of a chunk (as a
+    # table with table_class), or the NEW wires of a 'wires' task
+    def parse_chunk(self, section, kind, chunk, offset=0, binary=False):
+        if kind == 'wires':
+            return self.parse_wires_chunk(chunk)
+        if section == 'components' and self.components_table:
+            return self.parse_components_table(chunk)
+        result = self.parse_records_chunk(section, chunk, offset, binary)
+        table = self.table_class(section)
+        if table is not None and kind == 'records':
+            result = table.from_records(result)
+        return result
+
+    # Parse the COMPONENTS section in this process with the fast path
+    def parse_components_fast(self, section_string):
+        body_start, spans = split_records(section_string, 1)
+        if not spans:
+            return {}  # no records: the COMPONENTS grammar (OneOrMore) does not match either
+        body_end = spans[-1][1]
+
+        header = self.get_grammar('components_header')
+        components = header.parseString(section_string[:body_start]).asDict()
+        if self.components_table:
+            components['table'] = self.parse_components_table(section_string[body_start:body_end])
+        else:
+            components['subcomponents'] = self.parse_components_chunk(section_string[body_start:body_end])
+        return {'COMPONENTS': components}
+
+    # Parse a chunk of whole records of a block section, see RECORDS.
+    # offset is the position of the chunk in the file, a byte offset with
+    # binary when chunk was decoded from a bytes-like file (see shift_skipped)
+    def parse_records_chunk(self, section, chunk, offset=0, binary=False):
+        if section == 'components':
+            return self.parse_components_chunk(chunk)
+
+        record, name = RECORDS[section]
+        records = pp.ZeroOrMore(self.get_grammar(record))
+        records = records.parseString(chunk, parseAll=True).asDict().get(name, [])
+        return self.project_records(section, shift_skipped(records, offset, chunk, binary))
+
+    # Parse the 'COMPONENTS numComps ;' line
+    def parse_components_header(self):
+        components_id = pp.Keyword('COMPONENTS')
+        header = pp.Suppress(components_id) + number('numComps') + linebreak
+
+        return header
+
+    # Yield the records of a chunk of whole COMPONENTS records: the component_re
+    # match of the plain placement ones, the subcomponent dict of the others
+    def scan_components_chunk(self, chunk):
+        subcomponent = self.get_grammar('subcomponent')
+        pos = 0
+        while True:
+            m = component_re.match(chunk, pos)
+            if m is not None:
+                yield m
+                pos = m.end()
+                continue
+
+            end = record_end(chunk, pos)
+            record = chunk[pos:end]
+            if not record.strip():
+                break
+            for comp in subcomponent.parseString(record, parseAll=True).asDict()['subcomponents']:
+                yield comp
+            pos = end
+
+    # Parse a chunk of whole COMPONENTS records. With components_fast_path the
+    # records matching component_re skip pyparsing, the others use subcomponent
+    def parse_components_chunk(self, chunk):
+        if not self.components_fast_path:
+            subcomponents = pp.ZeroOrMore(self.get_grammar('subcomponent'))
+            comps = subcomponents.parseString(chunk, parseAll=True).asDict().get('subcomponents', [])
+            return self.project_records('components', comps)
+
+        comps = []
+        for m in self.scan_components_chunk(chunk):
+            if isinstance(m, dict):
+                comps.append(m)
+            else:
+                name, cell, status, x, y, orient, weight = m.groups()
+                x = int(x)
+                y = int(y)
+                comp = {'comp_name': name,
+                        'cell': cell,
+                        'compName': [name, cell],
+                        'placement_x': x,
+                        'placement_y': y,
+                        'orientation': orient,
+                        'PLACEMENT': [status, x, y, orient],
+                       }
+                if weight is not None:
+                    comp['weight'] = int(weight)
+                    comp['WEIGHT'] = ['WEIGHT', comp['weight']]
+                comps.append(comp)
+
+        return self.project_records('components', comps)
+
+    # Parse a chunk of whole COMPONENTS records in a def_table.ComponentTable.
+    # The matched fields are collected in rows and converted in one batch.
+    def parse_components_table(self, chunk):
+        from def_table import ComponentTable, component_row
+        if not self.components_fast_path:
+            return ComponentTable.from_records(self.parse_components_chunk(chunk))
+
+        rows = []
+        for m in self.scan_components_chunk(chunk):
+            if isinstance(m, dict):
+                rows.append(component_row(m))
+            else:
+                rows.append(m.group(1, 2, 3, 4, 5, 6))
+        return ComponentTable.from_rows(rows)
 
     # Parse the PINS section of a .DEF file
     def parse_pins(self):
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         pins_id = pp.Keyword('PINS')
         end_pins_id = pp.Keyword("END PINS").suppress()
+        pin = self.get_grammar('pin')
+
+        pins = pp.Group(pp.Suppress(pins_id) + number('numPins') + linebreak
+                        + pp.OneOrMore(pin)
+                        + pp.Suppress(end_pins_id)
+                       ).setResultsName('PINS')
+
+        return pins
+
+    # Parse the 'PINS numPins ;' line
+    def parse_pins_header(self):
+        pins_id = pp.Keyword('PINS')
+        header = pp.Suppress(pins_id) + number('numPins') + linebreak
+
+        return header
+
+    # Parse a single '- pinName + NET netName ... ;' record of the PINS section
+    def parse_pin(self):
         begin_pin = pp.Keyword('-')
         ws_pin = pp.Suppress(pp.Keyword('+'))  # parameter division in pins
 
@@ -420,6 +1372,12 @@ class DefParser:
                           | pp.Group(LAYER | POLYGON | VIA)
                           | pp.Group(COVER | FIXED | PLACED)
                          )
+        PLACEMENT = pp.ZeroOrMore(PLACEMENT_PINS)('PLACEMENT')
+        CLAUSES['PLACEMENT'] = PLACEMENT
+        if self.ignore_pins_geometry:
+            # The geometry is the last part of the record: skip up to ';'
+            PLACEMENT = skip_clause('PORT', 'LAYER', 'POLYGON', 'VIA', 'COVER', 'FIXED', 'PLACED',
+                                    stop=(), name='PLACEMENT')
 
         pin = pp.Group(pp.Suppress(begin_pin)
                        + pinName
@@ -438,22 +1396,35 @@ class DefParser:
                        + pp.ZeroOrMore(ANTENNAPINMAXAREACAR)
                        + pp.ZeroOrMore(ANTENNAPINMAXSIDEAREACAR)
                        + pp.ZeroOrMore(ANTENNAPINMAXCUTCAR)
-                       + pp.ZeroOrMore(PLACEMENT_PINS)('PLACEMENT')
+                       + PLACEMENT
                        + linebreak
                       ).setResultsName('pin', listAllMatches=True)
 
-        pins = pp.Group(pp.Suppress(pins_id) + number('numPins') + linebreak
-                        + pp.OneOrMore(pin)
-                        + pp.Suppress(end_pins_id)
-                       ).setResultsName('PINS')
-
-        return pins
+        return pin
 
     # Parse the NETS section of a .DEF file
     def parse_nets(self):
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         nets_id = pp.Keyword('NETS')
         end_nets_id = pp.Keyword("END NETS").suppress()
+        net = self.get_grammar('net')
+
+        nets = pp.Group(pp.Suppress(nets_id)
+                        + number('numNets') + linebreak
+                        + pp.ZeroOrMore(net)
+                        + pp.Suppress(end_nets_id)
+                       ).setResultsName('NETS')
+
+        return nets
+
+    # Parse the 'NETS numNets ;' line
+    def parse_nets_header(self):
+        nets_id = pp.Keyword('NETS')
+        header = pp.Suppress(nets_id) + number('numNets') + linebreak
+
+        return header
+
+    # Parse a single '- netName ( compName pinName ) ... ;' record of the NETS section
+    def parse_net(self):
         begin_net = pp.Keyword('-')
         ws_net = pp.Suppress(pp.Keyword('+'))  # parameter division in NETS
 
@@ -679,9 +1650,33 @@ class DefParser:
                             + number('propVal'))
                            )('PROPERTY')
 
-        # Refactor this!?
+        # Skip switches (self.ignore_nets_*)
+        CLAUSES['VPIN'] = VPIN
+        CLAUSES['SUBNET'] = SUBNET
+        CLAUSES['WIRING'] = regularWiring
         if self.ignore_nets_route:
-            regularWiring = pp.SkipTo((EOL + ws_net) | linebreak)
+            regularWiring = skip_clause('COVER', 'FIXED', 'ROUTED', 'NOSHIELD', name='WIRING')
+        if self.ignore_nets_vpin:
+            VPIN = skip_clause('VPIN', name='VPIN')
+        if self.ignore_nets_subnet:
+            SUBNET = skip_clause('SUBNET', name='SUBNET')
+
+        # Projection (self.fields): the clauses without a requested field are skipped
+        SHIELDNET = self.project('nets', SHIELDNET, skip_clause('SHIELDNET'), 'SHIELDNET')
+        VPIN = self.project('nets', VPIN, skip_clause('VPIN'), 'VPIN')
+        SUBNET = self.project('nets', SUBNET, skip_clause('SUBNET'), 'SUBNET')
+        XTALK = self.project('nets', XTALK, skip_clause('XTALK'), 'XTALK_class')
+        NONDEFAULTRULE = self.project('nets', NONDEFAULTRULE, skip_clause('NONDEFAULTRULE'), 'NONDEFAULTRULE_ruleName')
+        regularWiring = self.project('nets', regularWiring, skip_clause('COVER', 'FIXED', 'ROUTED', 'NOSHIELD'), 'WIRING')
+        SOURCE = self.project('nets', SOURCE, skip_clause('SOURCE'), 'SOURCE')
+        FIXEDBUMP = self.project('nets', FIXEDBUMP, skip_clause('FIXEDBUMP'), 'FIXEDBUMP')
+        FREQUENCY = self.project('nets', FREQUENCY, skip_clause('FREQUENCY'), 'FREQUENCY')
+        ORIGINAL = self.project('nets', ORIGINAL, skip_clause('ORIGINAL'), 'ORIGINAL_netName')
+        USE = self.project('nets', USE, skip_clause('USE'), 'USE')
+        PATTERN = self.project('nets', PATTERN, skip_clause('PATTERN'), 'PATTERN')
+        ESTCAP = self.project('nets', ESTCAP, skip_clause('ESTCAP'), 'ESTCAP_wireCap')
+        WEIGHT = self.project('nets', WEIGHT, skip_clause('WEIGHT'), 'WEIGHT')
+        PROPERTY = self.project('nets', PROPERTY, skip_clause('PROPERTY'), 'PROPERTY')
 
         net = pp.Group(pp.Suppress(begin_net)
                        + netName
@@ -703,19 +1698,31 @@ class DefParser:
                        + linebreak
                       ).setResultsName('net', listAllMatches=True)
 
-        nets = pp.Group(pp.Suppress(nets_id)
-                        + number('numNets') + linebreak
-                        + pp.ZeroOrMore(net)
-                        + pp.Suppress(end_nets_id)
-                       ).setResultsName('NETS')
-
-        return nets
+        return net
 
     # Parse the SPECIALNETS section of a .DEF file
     def parse_specialnets(self):
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
         specialnets_id = pp.Suppress(pp.Keyword('SPECIALNETS'))
         end_specialnets_id = pp.Keyword("END SPECIALNETS").suppress()
+        specialnet = self.get_grammar('specialnet')
+
+        specialnets = pp.Group(specialnets_id
+                               + number('numNets') + linebreak
+                               + pp.ZeroOrMore(specialnet)
+                               + pp.Suppress(end_specialnets_id)
+                              ).setResultsName('SPECIALNETS')
+
+        return specialnets
+
+    # Parse the 'SPECIALNETS numNets ;' line
+    def parse_specialnets_header(self):
+        specialnets_id = pp.Keyword('SPECIALNETS')
+        header = pp.Suppress(specialnets_id) + number('numNets') + linebreak
+
+        return header
+
+    # Parse a single '- netName ... ;' record of the SPECIALNETS section
+    def parse_specialnet(self):
         begin_specialnet = pp.Suppress(pp.Keyword('-'))
         ws_snet = pp.Suppress(pp.Keyword('+'))  # parameter division in NETS
 
@@ -762,29 +1769,40 @@ class DefParser:
                        | pp.Keyword('FILLWIRE') | pp.Keyword('FILLWIREOPC') | pp.Keyword('DRCFILL')
                       )
 
+        NEW_wire = pp.Group(pp.Keyword('NEW')
+                            + identifier('layerName')
+                            + number('routeWidth')
+                            + pp.Optional(ws_snet
+                                          + pp.Keyword('SHAPE')
+                                          + SHAPE_elems('SHAPE')
+                                         )
+                            + pp.Optional(ws_snet
+                                          + pp.Keyword('STYLE')
+                                          + identifier('styleNum')
+                                         )
+                            + routingPoints('routingPoints')
+                           )
+        # The NEW wires parsed apart by parallel_specialnets
+        CLAUSES['NEW'] = pp.Group(pp.ZeroOrMore(NEW_wire))('NEW')
+
         specialWiring_2 = (specialWiring_placement
                            + identifier('layerName') + number('routeWidth')
                            + pp.Optional(ws_snet + pp.Keyword('SHAPE') + SHAPE_elems('SHAPE'))
                            + pp.Optional(ws_snet + pp.Keyword('STYLE') + number('styleNum'))
                            + routingPoints('routingPoints')
-                           + pp.Group(pp.ZeroOrMore(pp.Group(pp.Keyword('NEW')
-                                                             + identifier('layerName')
-                                                             + number('routeWidth')
-                                                             + pp.Optional(ws_snet
-                                                                           + pp.Keyword('SHAPE')
-                                                                           + SHAPE_elems('SHAPE')
-                                                                          )
-                                                             + pp.Optional(ws_snet
-                                                                           + pp.Keyword('STYLE')
-                                                                           + identifier('styleNum')
-                                                                          )
-                                                             + routingPoints('routingPoints')
-                                                            )
-                                                   )
-                                     )
+                           + pp.Group(pp.ZeroOrMore(NEW_wire))
                           )('NEW')
 
-        specialWiring = pp.Group(pp.OneOrMore(specialWiring_1 | specialWiring_2))('specialWiring')
+        specialWiring = pp.ZeroOrMore(pp.Group(pp.OneOrMore(specialWiring_1 | specialWiring_2))('specialWiring'))
+        CLAUSES['specialWiring'] = specialWiring
+        if self.ignore_specialnets_route:
+            # The wiring has its own '+ SHAPE', '+ MASK', ... options: skip up
+            # to the first clause that follows it
+            specialWiring = skip_clause('COVER', 'FIXED', 'ROUTED', 'SHIELD', 'SHAPE', 'MASK',
+                                        'POLYGON', 'RECT', 'VIA',
+                                        stop=('SOURCE', 'FIXEDBUMP', 'ORIGINAL', 'USE', 'PATTERN',
+                                              'ESTCAP', 'WEIGHT', 'PROPERTY'),
+                                        name='specialWiring')
 
         VOLTAGE = ws_snet + pp.Keyword('VOLTAGE') + number('VOLTAGE')
 
@@ -814,7 +1832,7 @@ class DefParser:
         specialnet = pp.Group(begin_specialnet
                               + netName
                               + pp.Optional(VOLTAGE)
-                              + pp.ZeroOrMore(specialWiring)
+                              + specialWiring
                               + pp.Optional(SOURCE)
                               + pp.Optional(FIXEDBUMP)
                               + pp.Optional(ORIGINAL)
@@ -826,13 +1844,7 @@ class DefParser:
                               + linebreak
                              ).setResultsName('specialnets', listAllMatches=True)
 
-        specialnets = pp.Group(specialnets_id
-                               + number('numNets') + linebreak
-                               + pp.ZeroOrMore(specialnet)
-                               + pp.Suppress(end_specialnets_id)
-                              ).setResultsName('SPECIALNETS')
-
-        return specialnets
+        return specialnet
 
     #
     def handle_design(self, token):
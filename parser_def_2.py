@@ -1,7 +1,32 @@
 import pyparsing as pp
 from collections import defaultdict
-from multiprocessing import (Process, Manager, Event)
+from multiprocessing import (Event, Pool)
 import json
+from def_sections import (index_sections, section_slice)
+from def_compress import open_def, map_def
+
+# Parser and .DEF file used by the pool workers (see _init_worker)
+_worker_parser = None
+_worker_string = None
+_worker_index = None
+
+
+# Pool initializer: the parser and the file are inherited by the worker,
+# so the tasks only carry section names, never the file itself
+def _init_worker(parser, def_string=None, section_index=None):
+    global _worker_parser, _worker_string, _worker_index
+    _worker_parser = parser
+    _worker_string = def_string
+    _worker_index = section_index
+
+
+#
+def _parse_sections(sections):
+    return _worker_parser.parse_sections(sections, _worker_string, _worker_index)
+
+
+# Grammars built by DefParser.get_grammar, once per process and configuration
+GRAMMARS = {}
 
 class DefParser:
     #
@@ -11,7 +36,9 @@ class DefParser:
         self.ignore_specialnets = True
         self.ignore_nets = True
         self.ignore_nets_route = False
-        # Each list is a new process. Careful with dependencies.
+        # Map the .DEF files in memory instead of reading them in a str
+        self.use_mmap = False
+        # Each list is a task of the pool. Careful with dependencies.
         # 'dbuPerMicron' must be executed bofore the other, but can be after 'design'
         self.sections_grp = [['design', 'dbuPerMicron', 'diearea'],
                              ['components'],
@@ -35,7 +62,15 @@ class DefParser:
     #
     def run(self):
         for curr_def in self.def_files:
-            ifile = open(curr_def,'r')
+            if self.use_mmap:
+                # Only the parsed slices are decoded and the forked workers
+                # share the mapped pages instead of a copy of the file
+                file_string = map_def(curr_def)
+                self.parser_def(file_string)
+                file_string.close()
+                continue
+
+            ifile = open_def(curr_def)
             file_string = ifile.read()
             ifile.close()
             self.parser_def(file_string)
@@ -43,31 +78,54 @@ class DefParser:
 
     #
     def parser_def(self, file_string):
-        manager = Manager()
-        shared_dict = manager.dict()
+        results = {}
+        # Offsets of every section, so each grammar only scans its own slice
+        section_index = index_sections(file_string)
+        # Built here so the forked workers inherit them
+        self.build_grammars()
         # is_nets_section, is_not_nets_section  = self.divide_def_file(self.def_file_design[0])
-        jobs = []
-        for sections in self.sections_grp:
-            p = Process(target=self.parse_sections, args=(sections, file_string, shared_dict))
-            jobs.append(p)
-            p.start()
-
-        # Wait for the workers to finish
-        for job in jobs:
-            job.join()
+        # The workers return their results directly, no Manager proxy in between
+        with Pool(len(self.sections_grp), initializer=_init_worker,
+                  initargs=(self, file_string, section_index)) as pool:
+            jobs = [pool.apply_async(_parse_sections, (sections,)) for sections in self.sections_grp]
+            for job in jobs:
+                results.update(job.get())
 
         for sections in self.sections_grp:
             for section in sections:
-                getattr(self, 'handle_' + section)(shared_dict)
+                getattr(self, 'handle_' + section)(results)
 
-    # Spawn the processes from each group of self.sections_grp
-    def parse_sections(self, sections, def_string, shared_dict):
+    # Parse each section of a group of self.sections_grp and return the results
+    def parse_sections(self, sections, def_string, section_index=None):
+        results = {}
         for section in sections:
-            to_parse = getattr(self, 'parse_' + section)
-            for t, s, e in to_parse().scanString(def_string):
-                shared_dict.update(t.asDict())
+            if section == 'design':
+                self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
+            elif section in ('dbuPerMicron', 'diearea', 'components'):
+                self.events[0].wait()  # Wait for event[0] to finish
+
+            to_parse = self.get_grammar(section)
+            section_string = section_slice(def_string, section_index, section)
+            for t, s, e in to_parse.scanString(section_string):
+                results.update(t.asDict())
                 break
 
+        return results
+
+    # Return the grammar of parse_<section>. It is built once per process and
+    # configuration, then shared by every file and by the forked workers
+    def get_grammar(self, section):
+        key = (section, self.ignore_nets_route)
+        if key not in GRAMMARS:
+            GRAMMARS[key] = getattr(self, 'parse_' + section)()
+        return GRAMMARS[key]
+
+    # Build the grammars of self.sections_grp before the workers are forked
+    def build_grammars(self):
+        for sections in self.sections_grp:
+            for section in sections:
+                self.get_grammar(section)
+
     # Parse the DESIGN section of a .DEF file
     def parse_design(self):
         EOL = pp.LineEnd().suppress()
@@ -88,7 +146,6 @@ class DefParser:
         pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
         design_id  = pp.Keyword('DESIGN')
         design     = design_id + identifier('DESIGN') + linebreak
-        self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
         return design
 
     # Parse the UNITS DISTANCE MICRONS section of a .DEF file
@@ -109,7 +166,6 @@ class DefParser:
                 | pp.Keyword('FE')
                 | pp.Keyword('FW'))
         pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
         dbuPerMicron_id  = pp.Keyword('UNITS DISTANCE MICRONS')
         dbuPerMicron     = dbuPerMicron_id + number('dbuPerMicron') + linebreak
 
@@ -133,7 +189,6 @@ class DefParser:
                 | pp.Keyword('FE')
                 | pp.Keyword('FW'))
         pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
         diearea_id  = pp.Keyword('DIEAREA')
         diearea     = pp.Group(pp.Suppress(diearea_id)
                                + pp.OneOrMore(pt)
@@ -160,7 +215,6 @@ class DefParser:
                 | pp.Keyword('FE')
                 | pp.Keyword('FW'))
         pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # Wait for event[0] to finish
         components_id = pp.Keyword('COMPONENTS')
         end_components_id = pp.Keyword("END COMPONENTS").suppress()
         begin_comp = pp.Suppress(pp.Keyword('-'))
@@ -1,25 +1,64 @@
-import pyparsing as pp
 from collections import defaultdict
-from multiprocessing import (Process, Manager, Event)
+from threading import Event
 import json
-
-# GLOBALS for this class
-EOL = pp.LineEnd().suppress()
-linebreak = pp.Suppress(";" + pp.LineEnd())
-identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-number = pp.pyparsing_common.number
-word = pp.Word(pp.alphas)
-LPAR = pp.Suppress('(')
-RPAR = pp.Suppress(')')
-ORIENT = (pp.Keyword('N')
-        | pp.Keyword('S')
-        | pp.Keyword('E')
-        | pp.Keyword('W')
-        | pp.Keyword('FN')
-        | pp.Keyword('FS')
-        | pp.Keyword('FE')
-        | pp.Keyword('FW'))
-pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
+import re
+import string
+from def_sections import (index_sections, section_slice)
+
+# pyparsing and the tokens shared by the grammars are only imported when the
+# first grammar is built (see load_pyparsing): the import is most of the
+# startup time of a short job, and the simple statements are read without it
+pp = None
+IDENTIFIER_CHARS = string.ascii_letters + string.digits + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~'  # CONFLICT with '();'
+
+
+# Import pyparsing and build the tokens shared by the grammars, once
+def load_pyparsing():
+    global pp, EOL, linebreak, identifier, number, word, LPAR, RPAR, ORIENT, pt
+    if pp is not None:
+        return
+
+    import pyparsing
+    EOL = pyparsing.LineEnd().suppress()
+    linebreak = pyparsing.Suppress(";" + pyparsing.LineEnd())
+    identifier = pyparsing.Word(IDENTIFIER_CHARS)
+    number = pyparsing.pyparsing_common.number
+    word = pyparsing.Word(pyparsing.alphas)
+    LPAR = pyparsing.Suppress('(')
+    RPAR = pyparsing.Suppress(')')
+    ORIENT = (pyparsing.Keyword('N')
+            | pyparsing.Keyword('S')
+            | pyparsing.Keyword('E')
+            | pyparsing.Keyword('W')
+            | pyparsing.Keyword('FN')
+            | pyparsing.Keyword('FS')
+            | pyparsing.Keyword('FE')
+            | pyparsing.Keyword('FW'))
+    pt = LPAR + pyparsing.OneOrMore(number | pyparsing.Keyword('*')) + RPAR  # pair of x,y
+    pp = pyparsing
+
+
+# The simple statements, read with a regex instead of their grammar
+_NUMBER = r'[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?'
+_LINEBREAK = r'\s*;[ \t\r]*(?:\n|\Z)'
+SIMPLE_RES = {'design': re.compile(r'\bDESIGN\s+([' + re.escape(IDENTIFIER_CHARS) + r']+)' + _LINEBREAK),
+              'dbuPerMicron': re.compile(r'\bUNITS DISTANCE MICRONS\s+(' + _NUMBER + r')(?![\w$.])' + _LINEBREAK),
+              'diearea': re.compile(r'\bDIEAREA((?:\s*\((?:\s*(?:' + _NUMBER + r'|\*)(?![\w$.]))+\s*\))+)' + _LINEBREAK),
+             }
+_TOKEN = re.compile(_NUMBER + r'|\*')
+
+
+# Convert a number token as pyparsing_common.number does
+def _number(token):
+    if token == '*':
+        return token
+    if '.' in token or 'e' in token or 'E' in token:
+        return float(token)
+    return int(token)
+
+
+# Grammars built by DefParser.get_grammar, once per process and configuration
+GRAMMARS = {}
 
 class DefParser:
     #
@@ -29,6 +68,11 @@ class DefParser:
         self.ignore_specialnets = True
         self.ignore_nets = True
         self.ignore_nets_route = False
+        # Read DESIGN, UNITS and DIEAREA with SIMPLE_RES, so that a job only
+        # asking for them does not import pyparsing
+        self.simple_fast_path = True
+        # Map the .DEF files in memory instead of reading them in a str
+        self.use_mmap = False
         # Each list is a new process. Careful with dependencies.
         # 'dbuPerMicron' must be executed bofore the other, but can be after 'design'
         self.sections_grp = [['design', 'dbuPerMicron', 'diearea'],
@@ -52,8 +96,16 @@ class DefParser:
 
     #
     def run(self):
+        from def_compress import open_def, map_def  # .gz/.bz2/.xz inputs, imported when used
         for curr_def in self.def_files:
-            ifile = open(curr_def,'r')
+            if self.use_mmap:
+                # Only the parsed slices are decoded
+                file_string = map_def(curr_def)
+                self.parser_def(file_string)
+                file_string.close()
+                continue
+
+            ifile = open_def(curr_def)
             file_string = ifile.read()
             ifile.close()
             self.parser_def(file_string)
@@ -61,68 +113,75 @@ class DefParser:
 
     #
     def parser_def(self, file_string):
-        manager = Manager()
-        shared_dict = manager.dict()
+        results = {}
+        # Offsets of every section, so each grammar only scans its own slice
+        section_index = index_sections(file_string)
+        self.build_grammars()
         # is_nets_section, is_not_nets_section  = self.divide_def_file(self.def_file_design[0])
         for sections in self.sections_grp:
-            self.parse_sections(sections, file_string, shared_dict)
+            results.update(self.parse_sections(sections, file_string, section_index))
 
         for sections in self.sections_grp:
             for section in sections:
-                getattr(self, 'handle_' + section)(shared_dict)
+                getattr(self, 'handle_' + section)(results)
 
-    # Spawn the processes from each group of self.sections_grp
-    def parse_sections(self, sections, def_string, shared_dict):
+    # Parse each section of a group of self.sections_grp and return the results
+    def parse_sections(self, sections, def_string, section_index=None):
+        results = {}
         for section in sections:
-            to_parse = getattr(self, 'parse_' + section)
-            for t, s, e in to_parse().scanString(def_string):
-                shared_dict.update(t.asDict())
+            if section == 'design':
+                self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
+            elif section in ('dbuPerMicron', 'diearea', 'components'):
+                self.events[0].wait()  # Wait for event[0] to finish
+
+            section_string = section_slice(def_string, section_index, section)
+            m = SIMPLE_RES[section].search(section_string) if self.simple_fast_path and section in SIMPLE_RES else None
+            if m is not None:
+                results.update(self.parse_simple(section, m))
+                continue
+
+            to_parse = self.get_grammar(section)
+            for t, s, e in to_parse.scanString(section_string):
+                results.update(t.asDict())
                 break
 
+        return results
+
+    # Return the grammar of parse_<section>. It is built once per process and
+    # configuration, then shared by every file and by the forked workers
+    def get_grammar(self, section):
+        key = (section, self.ignore_nets_route)
+        if key not in GRAMMARS:
+            load_pyparsing()
+            GRAMMARS[key] = getattr(self, 'parse_' + section)()
+        return GRAMMARS[key]
+
+    # Return the results of a simple statement matched by SIMPLE_RES, the same
+    # as its grammar gives
+    def parse_simple(self, section, m):
+        if section == 'design':
+            return {'DESIGN': m.group(1)}
+        if section == 'dbuPerMicron':
+            return {'dbuPerMicron': _number(m.group(1))}
+        return {'DIEAREA': [_number(token) for token in _TOKEN.findall(m.group(1))]}
+
+    # Build the grammars of self.sections_grp up front. The statements of
+    # SIMPLE_RES are read without a grammar: theirs is only built (and
+    # pyparsing imported) if parse_sections falls back to it
+    def build_grammars(self):
+        for sections in self.sections_grp:
+            for section in sections:
+                if not (self.simple_fast_path and section in SIMPLE_RES):
+                    self.get_grammar(section)
+
     # Parse the DESIGN section of a .DEF file
     def parse_design(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
         design_id  = pp.Keyword('DESIGN')
         design     = design_id + identifier('DESIGN') + linebreak
-        self.events[0].set()  # event[0] (parse_dbuPerMicron) has priority
         return design
 
     # Parse the UNITS DISTANCE MICRONS section of a .DEF file
     def parse_dbuPerMicron(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
         dbuPerMicron_id  = pp.Keyword('UNITS DISTANCE MICRONS')
         dbuPerMicron     = dbuPerMicron_id + number('dbuPerMicron') + linebreak
 
@@ -130,24 +189,6 @@ class DefParser:
 
     # Parse the DIEAREA section of a .DEF file
     def parse_diearea(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # event[0] (parse_dbuPerMicron) has priority
         diearea_id  = pp.Keyword('DIEAREA')
         diearea     = pp.Group(pp.Suppress(diearea_id)
                                + pp.OneOrMore(pt)
@@ -158,24 +199,6 @@ class DefParser:
 
     # Parse the COMPONENTS section of a .DEF file
     def parse_components(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
-        self.events[0].wait()  # Wait for event[0] to finish
         components_id = pp.Keyword('COMPONENTS')
         end_components_id = pp.Keyword("END COMPONENTS").suppress()
         begin_comp = pp.Suppress(pp.Keyword('-'))
@@ -281,23 +304,6 @@ class DefParser:
 
     # Parse the PINS section of a .DEF file
     def parse_pins(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
         pins_id = pp.Keyword('PINS')
         end_pins_id = pp.Keyword("END PINS").suppress()
         begin_pin = pp.Keyword('-')
@@ -525,23 +531,6 @@ class DefParser:
 
     # Parse the NETS section of a .DEF file
     def parse_nets(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
         nets_id = pp.Keyword('NETS')
         end_nets_id = pp.Keyword("END NETS").suppress()
         begin_net = pp.Keyword('-')
@@ -803,23 +792,6 @@ class DefParser:
 
     # Parse the SPECIALNETS section of a .DEF file
     def parse_specialnets(self):
-        # GLOBALS for this class
-        EOL = pp.LineEnd().suppress()
-        linebreak = pp.Suppress(";" + pp.LineEnd())
-        identifier = pp.Word(pp.alphanums + '._“!<>/[]$#$%&‘*+,/:<=>?@[\]^_`{|}~')  # CONFLICT with '();'
-        number = pp.pyparsing_common.number
-        word = pp.Word(pp.alphas)
-        LPAR = pp.Suppress('(')
-        RPAR = pp.Suppress(')')
-        ORIENT = (pp.Keyword('N')
-                | pp.Keyword('S')
-                | pp.Keyword('E')
-                | pp.Keyword('W')
-                | pp.Keyword('FN')
-                | pp.Keyword('FS')
-                | pp.Keyword('FE')
-                | pp.Keyword('FW'))
-        pt = LPAR + pp.OneOrMore(number | pp.Keyword('*')) + RPAR  # pair of x,y
         specialnets_id = pp.Suppress(pp.Keyword('SPECIALNETS'))
         end_specialnets_id = pp.Keyword("END SPECIALNETS").suppress()
         begin_specialnet = pp.Suppress(pp.Keyword('-'))